@@ -1,24 +1,33 @@
-from rebalancer.testers import BackTester, LiveTester
-from telethon import TelegramClient, sync
+from rebalancer.orchestrator import Orchestrator
+from rebalancer.testers import BackTester, LiveTester, RobustnessTester, SweepTester
+import logging
 import os
 import yaml
 
 tester_types = {
     "backtest": BackTester,
-    "livetest": LiveTester
+    "livetest": LiveTester,
+    "sweep": SweepTester,
+    "robustness": RobustnessTester
 }
 
-api_id = os.environ.get('api_id')
-api_hash = os.environ.get('api_hash')
-
-if None in [api_id, api_hash]:
-    raise ValueError("Check environment variables")
-
 config_uri = "./rebalancer/config.yaml"
 conf = yaml.load(open(config_uri, "r"))
 
+logging.basicConfig(level=(conf.get("log_level") or "INFO").upper(),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
 
 if conf['telegram_on']:
+    # Telethon is only loaded, and its keys only needed, when reporting to Telegram
+    from telethon import TelegramClient, sync
+
+    api_id = os.environ.get('api_id')
+    api_hash = os.environ.get('api_hash')
+
+    if None in [api_id, api_hash]:
+        raise ValueError("Check environment variables")
+
     client = TelegramClient('rebalancer', api_id, api_hash).start()
 else:
     client = None
@@ -31,6 +40,11 @@ if conf["tester_type"] in tester_types:
         tester1.rebalance_backtest()
         tester1.plot()
 
+    elif conf["tester_type"] == "livetest" and conf.get("accounts"):
+        tester = Orchestrator(conf)
+        tester.client = client
+        tester.start()
+
     elif conf["tester_type"] == "livetest":
         Tester = tester_types[conf["tester_type"]]  # insig time
         tester = Tester(conf)  # ~2.77489 seconds
@@ -39,6 +53,18 @@ if conf["tester_type"] in tester_types:
             tester.client = client
 
         tester.start()
+
+    elif conf["tester_type"] == "sweep":
+        Tester = tester_types[conf["tester_type"]]
+        tester = Tester(conf)
+
+        tester.run_sweep()
+
+    elif conf["tester_type"] == "robustness":
+        Tester = tester_types[conf["tester_type"]]
+        tester = Tester(conf)
+
+        tester.run_robustness()
     else:
         pass
 else:
@@ -0,0 +1,229 @@
+"""
+Benchmarks of the rebalance math, backtest loop and API client on synthetic portfolios and price histories.
+
+The HTTP layer is served by an in-process mock_exchange, so no network or API keys are needed. Every benchmark reports
+its wall time (best and mean of the repeats), peak traced memory and number of allocations, and results are written
+as JSON so runs can be compared:
+
+    python benchmarks/bench.py --output before.json
+    python benchmarks/bench.py --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import datetime
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rebalancer.async_api as async_api  # noqa: E402
+import rebalancer.binance_api as api  # noqa: E402
+import rebalancer.engine as engine  # noqa: E402
+import rebalancer.mock_exchange as mock_exchange  # noqa: E402
+from rebalancer.exchange_info import SymbolFilters  # noqa: E402
+from rebalancer.portfolio import Portfolio  # noqa: E402
+from rebalancer.testers import BackTester, Tester  # noqa: E402
+
+
+def synthetic_symbols(coins):
+    """BTCUSDT followed by coins - 1 made up BTC pairs"""
+    return ["BTCUSDT"] + ["C{0:03d}BTC".format(coin) for coin in range(coins - 1)]
+
+
+def synthetic_portfolio(symbols):
+    """A portfolio.csv frame with equal targets and no protected balances"""
+    return pd.DataFrame({"coin_name": [symbol[:-4] if symbol.endswith("USDT") else symbol[:-3] for symbol in symbols],
+                         "target": 1.0 / len(symbols),
+                         "protected_balance": 0.0}, index=pd.Index(symbols, name="symbol"))
+
+
+class FakeExchangeInfo(object):
+    """Exchange info index of synthetic symbols, see rebalancer.exchange_info.ExchangeInfo"""
+    def __init__(self, symbols):
+        self.index = {symbol: SymbolFilters(symbol, symbol[:-3], symbol[-3:], "TRADING", 0.001, 90000000.0, 0.001,
+                                            0.00000001, 100000.0, 0.00000001, 0.001) for symbol in symbols}
+
+    def __getitem__(self, symbol):
+        return self.index[symbol]
+
+
+def make_tester(cls, symbols):
+    """A tester over synthetic symbols, built without the exchange calls of __init__"""
+    tester = cls.__new__(cls)
+    tester.data = synthetic_portfolio(symbols)
+    tester.portfolio = Portfolio(symbols, tester.data['target'])
+    tester.exchange_info = FakeExchangeInfo(symbols)
+    tester.transaction_fee = 0.001
+    tester.min_btc_order = 0.001
+    tester.volume_of_trades = 0
+    tester.number_of_trades = 0
+    tester.volumes = []
+    tester.trades = []
+    tester.rebalance = []
+    tester.hodl = []
+    tester.portfolio_total = 0
+    tester.hodl_total = 0
+    return tester
+
+
+def measure(function, repeats):
+    """Times function, then runs it once more under tracemalloc for its memory peak and allocation count"""
+    times = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    function()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocations = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    return {"best_seconds": min(times), "mean_seconds": sum(times) / len(times),
+            "peak_bytes": peak, "allocations": allocations}
+
+
+def bench_update(coins, repeats):
+    """BackTester.update(), the per tick pandas rebalance math"""
+    symbols = synthetic_symbols(coins)
+    tester = make_tester(BackTester, symbols)
+    prices = mock_exchange.synthetic_history(symbols, ticks=1, seed=0).iloc[0]
+    tester.data['portfolio_prices'] = prices
+    tester.data['portfolio_balances'] = 1.0 / prices
+    tester.data['hodl_balances'] = tester.data['portfolio_balances']
+    return measure(tester.update, repeats)
+
+
+def bench_lot_sizes(coins, repeats):
+    """Tester.get_portfolio_lot_sizes() from the exchange info index"""
+    tester = make_tester(Tester, synthetic_symbols(coins))
+    return measure(tester.get_portfolio_lot_sizes, repeats)
+
+
+def bench_backtest(coins, ticks, repeats):
+    """The stages of BackTester.rebalance_backtest(): USD conversion then the engine"""
+    symbols = synthetic_symbols(coins)
+    closes = mock_exchange.synthetic_history(symbols, ticks=ticks, seed=0).to_numpy()
+    balances = np.full(coins, 1.0 / coins) / engine.usd_prices(closes[:1], 0)[0]
+    targets = np.full(coins, 1.0 / coins)
+
+    usd_prices = engine.usd_prices(closes, 0)
+    return {
+        "usd_prices": measure(lambda: engine.usd_prices(closes, 0), repeats),
+        "run_backtest": measure(lambda: engine.run_backtest(usd_prices, balances, balances, targets, 0.001, 0),
+                                repeats),
+    }
+
+
+def bench_http(coins, calls, repeats):
+    """Per endpoint latency of binance_api against the local mock exchange, serial and concurrent"""
+    symbols = synthetic_symbols(coins)
+    exchange = mock_exchange.MockExchange(mock_exchange.synthetic_history(symbols, ticks=1000, seed=0),
+                                          start_row=999, tick_seconds=0)
+    server = mock_exchange.serve(exchange)
+    api.configure(endpoint="http://127.0.0.1:{0}".format(server.server_port))
+    api.set("benchmark", "benchmark")
+
+    async def open_orders():
+        await asyncio.gather(*(async_api.openOrders(symbol) for symbol in symbols[1:]))
+
+    stages = {
+        "server_time": lambda: [api.get_server_time() for _ in range(calls)],
+        "prices": lambda: [api.prices() for _ in range(calls)],
+        "balances": lambda: [api.balances() for _ in range(calls)],
+        "open_orders_serial": lambda: [api.openOrders(symbol) for symbol in symbols[1:]],
+        "open_orders_concurrent": lambda: async_api.run(open_orders()),
+        "open_orders_snapshot": lambda: api.openOrders(),
+    }
+    try:
+        results = {name: measure(stage, repeats) for name, stage in stages.items()}
+    finally:
+        server.shutdown()
+    for name in ("server_time", "prices", "balances"):
+        results[name]["per_call_seconds"] = results[name]["best_seconds"] / calls
+    return results
+
+
+def run(coins, ticks, calls, repeats, max_cells):
+    results = []
+
+    def record(name, params, result):
+        results.append({"name": name, "params": params, "result": result})
+        print("{0:<40} {1:<30} {2:.6f}s  peak {3:.1f} KiB".format(name, json.dumps(params), result["best_seconds"],
+                                                                    result["peak_bytes"] / 1024))
+
+    for coin in coins:
+        record("tester.update", {"coins": coin}, bench_update(coin, repeats))
+        record("tester.get_portfolio_lot_sizes", {"coins": coin}, bench_lot_sizes(coin, repeats))
+        for tick in ticks:
+            if coin * tick > max_cells:
+                continue
+            for stage, result in bench_backtest(coin, tick, repeats).items():
+                record("backtest." + stage, {"coins": coin, "ticks": tick}, result)
+        for stage, result in bench_http(coin, calls, repeats).items():
+            record("http." + stage, {"coins": coin}, result)
+    return results
+
+
+def compare(results, previous):
+    """Prints the ratio of every best time to the same benchmark of a previous run"""
+    before = {(entry["name"], json.dumps(entry["params"], sort_keys=True)): entry["result"]
+              for entry in previous["results"]}
+    print("\nCompared to {0}:".format(previous["meta"]["timestamp"]))
+    for entry in results:
+        key = (entry["name"], json.dumps(entry["params"], sort_keys=True))
+        if key in before:
+            ratio = entry["result"]["best_seconds"] / before[key]["best_seconds"]
+            print("{0:<40} {1:<30} x{2:.2f}{3}".format(entry["name"], key[1], ratio,
+                                                      "  REGRESSION" if ratio > 1.2 else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--coins", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--ticks", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--calls", type=int, default=20, help="HTTP calls per endpoint stage")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-cells", type=int, default=20000000,
+                        help="skip backtests with more coins x ticks than this")
+    parser.add_argument("--output", default="benchmarks/results.json")
+    parser.add_argument("--compare", help="results JSON of a previous run")
+    args = parser.parse_args()
+
+    results = run(args.coins, args.ticks, args.calls, args.repeats, args.max_cells)
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print("\nResults written to {0}".format(args.output))
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import rebalancer.binance_api as api
+from concurrent.futures import ThreadPoolExecutor
+
+
+options = {
+    "max_concurrency": 8,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def configure(max_concurrency=None):
+    """Set the maximum number of API calls in flight at once.
+
+    Calls are sent through the pooled session of binance_api, so keep its pool_size at least as large.
+
+    Args:
+        max_concurrency (int, optional): default 8
+
+    """
+    global _executor
+    if max_concurrency is not None:
+        options["max_concurrency"] = max_concurrency
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = None
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=options["max_concurrency"],
+                                           thread_name_prefix="binance_api")
+        return _executor
+
+
+async def call(function, *args, **kwargs):
+    """Awaits a binance_api call, run on the bounded worker pool so the event loop is never blocked.
+
+    The synchronous module keeps doing the signing, retries and connection pooling, so both clients share the same
+    session and behave the same way.
+    """
+    loop = asyncio.get_running_loop()
+    # Carries the caller's context, e.g. the binance_api account in use, over to the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), functools.partial(context.run, function, *args, **kwargs))
+
+
+def run(coroutine):
+    """Runs a coroutine from synchronous code, e.g. the sched callbacks of LiveTester."""
+    return asyncio.run(coroutine)
+
+
+async def get_ping():
+    """Test request, returns []."""
+    return await call(api.get_ping)
+
+
+async def get_server_time():
+    """Fetches the binance server time in milliseconds."""
+    return await call(api.get_server_time)
+
+
+async def get_exchange_info():
+    """Get latest exchange information."""
+    return await call(api.get_exchange_info)
+
+
+async def prices():
+    """Get latest prices for all symbols."""
+    return await call(api.prices)
+
+
+async def tickers():
+    """Get best price/qty on the order book for all symbols."""
+    return await call(api.tickers)
+
+
+async def depth(symbol, **kwargs):
+    """Get order book, see binance_api.depth()."""
+    return await call(api.depth, symbol, **kwargs)
+
+
+async def klines(symbol, interval, **kwargs):
+    """Get kline/candlestick bars for a symbol, see binance_api.klines()."""
+    return await call(api.klines, symbol, interval, **kwargs)
+
+
+async def balances():
+    """Get current balances for all symbols."""
+    return await call(api.balances)
+
+
+async def order(symbol, side, quantity, price, orderType=api.LIMIT, timeInForce=api.GTC, test=False, **kwargs):
+    """Send in a new order, see binance_api.order()."""
+    return await call(api.order, symbol, side, quantity, price, orderType=orderType, timeInForce=timeInForce,
+                      test=test, **kwargs)
+
+
+async def orderStatus(symbol, **kwargs):
+    """Check an order's status, see binance_api.orderStatus()."""
+    return await call(api.orderStatus, symbol, **kwargs)
+
+
+async def cancel(symbol, **kwargs):
+    """Cancel an active order, see binance_api.cancel()."""
+    return await call(api.cancel, symbol, **kwargs)
+
+
+async def openOrders(symbol=None, **kwargs):
+    """Get all open orders on a symbol or the whole account, see binance_api.openOrders()."""
+    return await call(api.openOrders, symbol, **kwargs)
+
+
+async def allOrders(symbol, **kwargs):
+    """Get all account orders; active, canceled, or filled, see binance_api.allOrders()."""
+    return await call(api.allOrders, symbol, **kwargs)
+
+
+async def myTrades(symbol, **kwargs):
+    """Get trades for a specific account and symbol, see binance_api.myTrades()."""
+    return await call(api.myTrades, symbol, **kwargs)
@@ -1,14 +1,22 @@
+import contextvars
 import hmac
 import hashlib
 import logging
 import requests
+import threading
 import time
-import eventlet
+import rebalancer.metrics as metrics
+import rebalancer.rate_limit as rate_limit
+from contextlib import contextmanager
+from decimal import Decimal
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlencode
 
 
 ENDPOINT = "https://www.binance.com"
 
+logger = logging.getLogger(__name__)
+
 BUY = "BUY"
 SELL = "SELL"
 
@@ -18,8 +26,24 @@ MARKET = "MARKET"
 GTC = "GTC"
 IOC = "IOC"
 
+# Error code of an order the exchange does not know, or has archived
+NO_SUCH_ORDER = -2013
+
 options = {}
 
+session_options = {
+    "pool_size": 10,
+    "timeout": 5,
+    "max_retries": 5,
+}
+
+limiter = rate_limit.RateLimiter()
+
+_session = None
+_session_lock = threading.Lock()
+
+_account = contextvars.ContextVar("binance_account", default=None)
+
 
 def set(apiKey, secret):
     """Set API key and secret.
@@ -30,9 +54,88 @@ def set(apiKey, secret):
     options["secret"] = secret
 
 
+class Account(object):
+    """API key pair of one account, with a rate limit budget of its own for its signed calls."""
+    __slots__ = ("name", "key", "secret", "limiter")
+
+    def __init__(self, name, key, secret, weight_limit=None, order_limit=None):
+        self.name = name
+        self.key = key
+        self.secret = secret
+        self.limiter = rate_limit.RateLimiter(weight_limit=weight_limit or limiter.weights.capacity,
+                                              order_limit=order_limit or limiter.orders.capacity)
+
+
+@contextmanager
+def use(account):
+    """Signs the calls made in the with block with account's keys and budget, instead of those given to set().
+
+    The account is held in a context variable, so it only applies to the current thread or asyncio task, and to
+    the async_api calls they make.
+    """
+    token = _account.set(account)
+    try:
+        yield account
+    finally:
+        _account.reset(token)
+
+
+def credentials():
+    """(key, secret, limiter) of the account in use, or of set() and the shared limiter"""
+    account = _account.get()
+    if account is None:
+        return options["apiKey"], options["secret"], limiter
+    return account.key, account.secret, account.limiter
+
+
+def configure(pool_size=None, timeout=None, max_retries=None, weight_limit=None, order_limit=None, endpoint=None):
+    """Set connection pool size, per request timeout, retries, rate limits and the exchange endpoint.
+
+    Takes effect for the next session, so call before making any API calls.
+
+    Args:
+        pool_size (int, optional): keep-alive connections kept open to the endpoint, default 10
+        timeout (float, optional): seconds to wait for a connection or response before retrying, default 5
+        max_retries (int, optional): retries of a failed request before giving up, default 5
+        weight_limit (int, optional): request weight per minute, default 1200
+        order_limit (int, optional): orders per 10 seconds, default 50
+        endpoint (str, optional): exchange base url, e.g. a local mock_exchange, default https://www.binance.com
+
+    """
+    global _session, limiter, ENDPOINT
+    if endpoint is not None:
+        ENDPOINT = endpoint.rstrip("/")
+    if pool_size is not None:
+        session_options["pool_size"] = pool_size
+    if timeout is not None:
+        session_options["timeout"] = timeout
+    if max_retries is not None:
+        session_options["max_retries"] = max_retries
+    if weight_limit is not None or order_limit is not None:
+        limiter = rate_limit.RateLimiter(weight_limit=weight_limit or limiter.weights.capacity,
+                                         order_limit=order_limit or limiter.orders.capacity)
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def get_session():
+    """Returns the shared keep-alive session, connections are pooled and reused between calls and threads."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=session_options["pool_size"],
+                                  pool_maxsize=session_options["pool_size"])
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
 def get_ping():
     """Test request, returns []."""
-    print("Fetching ping: ")
+    logger.debug("Fetching ping")
     r = request("GET", "/api/v1/ping", {})
     return r
 
@@ -45,7 +148,7 @@ def get_server_time():
 
 def get_exchange_info():
     """Get latest exchange information."""
-    print("Fetching exchange info: ")
+    logger.info("Fetching exchange info")
     r = request("GET", "/api/v1/exchangeInfo", {})
     return r
 
@@ -194,15 +297,15 @@ def cancel(symbol, **kwargs):
     return data
 
 
-def openOrders(symbol, **kwargs):
-    """Get all open orders on a symbol.
+def openOrders(symbol=None, **kwargs):
+    """Get all open orders on a symbol, or on every symbol of the account if no symbol is given.
 
     Args:
-        symbol (str)
+        symbol (str, optional)
         recvWindow (int, optional)
 
     """
-    params = {"symbol": symbol}
+    params = {"symbol": symbol} if symbol is not None else {}
     params.update(kwargs)
     data = signedRequest("GET", "/api/v3/openOrders", params)
     return data
@@ -247,90 +350,132 @@ def myTrades(symbol, **kwargs):
 def request(method, path, params=None):
     """Sends a request from the requests module
 
-        If there is a TimeOut error or a bad request is sent (Status Code: 400),
-        another request is sent and the previous ignored. When Binance responds with status code 200
-        the data is processed.
+        Waits for the rate limiter, then sends the request. If there is a TimeOut error or the server errors, another
+        request is sent after a backoff and the previous ignored. When Binance responds with status code 200 or
+        rejects the request (Status Code: 4xx) the data is processed.
 
         Args:
             method (str)
             path (str)
 
     """
-    resp = None
-    eventlet.monkey_patch()
-
-    while not resp:
-        with eventlet.Timeout(5, False):
-            resp = requests.request(method, ENDPOINT + path, params=params)
-
-        if not resp:
-            print("Reattempting request: TimeOut")
-        elif resp:
-            if resp.status_code == 200:
-                print("200 OK Request.")
-            elif resp.status_code == 400:
-                print("400 Bad Request:\nThe server cannot or will not process the request due"
-                      " to an apparent client error (e.g., malformed request syntax, size too"
-                      " large, invalid request message framing, or deceptive request routing).")
-            else:
-                print(resp)
-        print()
+    resp = send(method, path, params)
 
     data = resp.json()
     if "msg" in data:
-        logging.error(data['msg'])
+        logger.error(data['msg'])
     return data
 
 
 def signedRequest(method, path, params):
     """Sends an api request from the requests module.
 
-        If there is a TimeOut error or a bad request is sent (Status Code: 400),
-        another request is sent and the previous ignored. When Binance responds with status code 200
-        the data is processed.
+        Waits for the rate limiter, then sends the request signed with a fresh timestamp. If there is a TimeOut error
+        or the server errors, another request is sent after a backoff and the previous ignored. When Binance responds
+        with status code 200 or rejects the request (Status Code: 4xx) the data is processed.
 
         Args:
             method (str)
             path (str)
 
     """
-    if "apiKey" not in options or "secret" not in options:
+    if _account.get() is None and ("apiKey" not in options or "secret" not in options):
         raise ValueError("Api key and secret must be set")
 
+    resp = send(method, path, params, signed=True)
+
+    data = resp.json()
+    if "code" in data:
+        logger.error(data['code'])
+    if "msg" in data:
+        logger.error(data['msg'])
+    return data
+
+
+def sign(params, secret):
+    """Returns the query string of params with a timestamp and its signature"""
     query = urlencode(sorted(params.items()))
     query += "&timestamp={}".format(int(time.time() * 1000))
-    secret = bytes(options["secret"].encode("utf-8"))
+    secret = bytes(secret.encode("utf-8"))
     signature = hmac.new(secret, query.encode("utf-8"),
                          hashlib.sha256).hexdigest()
     query += "&signature={}".format(signature)
+    return query
 
-    resp = None
-    eventlet.monkey_patch()
-
-    while not resp:
-        with eventlet.Timeout(5, False):
-            resp = requests.request(method,
-                                    ENDPOINT + path + "?" + query,
-                                    headers={"X-MBX-APIKEY": options["apiKey"]})
-        if resp is not None:
-            if resp.status_code == 200:
-                print("200 OK Request.")
-            if resp.status_code == 400:
-                print("400 Bad Request:\nThe server cannot or will not process the request due"
-                      " to an apparent client error (e.g., malformed request syntax, size too"
-                      " large, invalid request message framing, or deceptive request routing).")
-        print()
 
-    data = resp.json()
-    if "code" in data:
-        logging.error(data['code'])
-    if "msg" in data:
-        logging.error(data['msg'])
-    return data
+def send(method, path, params=None, signed=False):
+    """Sends a request through the pooled session and rate limiter.
+
+        Timeouts, connection errors and server errors (Status Code: 5xx) are retried with jittered exponential backoff
+        up to max_retries. A 429 or 418 response holds every call for its Retry-After before retrying. Any other
+        response is returned. Signed calls are limited by the budget of the account in use, see use().
+
+        Args:
+            method (str)
+            path (str)
+            params (dict, optional)
+            signed (bool, optional): sign the query, re-signed for every attempt
+
+    """
+    weight = rate_limit.weight(method, path, params)
+    priority = rate_limit.priority(method, path)
+    order = rate_limit.is_order(method, path)
+    key, secret, budget = credentials() if signed else (None, None, limiter)
+
+    for attempt in range(session_options["max_retries"] + 1):
+        with metrics.timer("api_rate_limit_wait_seconds", endpoint=path):
+            budget.acquire(weight, priority, order)
+        start = time.perf_counter()
+        try:
+            if signed:
+                resp = get_session().request(method, ENDPOINT + path + "?" + sign(params, secret),
+                                             headers={"X-MBX-APIKEY": key},
+                                             timeout=session_options["timeout"])
+            else:
+                resp = get_session().request(method, ENDPOINT + path, params=params,
+                                             timeout=session_options["timeout"])
+        except (requests.Timeout, requests.ConnectionError):
+            resp = None
+        metrics.observe("api_request_seconds", time.perf_counter() - start, endpoint=path, method=method)
+
+        if resp is None:
+            metrics.inc("api_retries_total", endpoint=path, reason="timeout")
+            logger.warning("Reattempting %s %s: TimeOut", method, path)
+            time.sleep(rate_limit.backoff(attempt))
+            continue
+
+        budget.update(resp.headers)
+        metrics.inc("api_responses_total", endpoint=path, status=resp.status_code)
+
+        if resp.status_code == 200:
+            logger.debug("200 OK Request %s %s", method, path)
+            return resp
+        elif resp.status_code in (418, 429):
+            metrics.inc("api_retries_total", endpoint=path, reason="rate_limited")
+            logger.warning("%s Rate limited, holding requests for %s seconds.", resp.status_code,
+                           resp.headers.get("Retry-After", 60))
+            budget.ban(resp.headers.get("Retry-After", 60))
+        elif resp.status_code == 400:
+            logger.warning("400 Bad Request %s %s: The server cannot or will not process the request due to an "
+                           "apparent client error (e.g., malformed request syntax, size too large, invalid request "
+                           "message framing, or deceptive request routing).", method, path)
+            return resp
+        elif resp.status_code < 500:
+            logger.warning("%s %s %s", resp.status_code, method, path)
+            return resp
+        else:
+            metrics.inc("api_retries_total", endpoint=path, reason="server_error")
+            logger.warning("Reattempting %s %s: %s", method, path, resp.status_code)
+            time.sleep(rate_limit.backoff(attempt))
+
+    raise ValueError("{0} {1} failed after {2} attempts".format(method, path, session_options["max_retries"] + 1))
 
 
 def formatNumber(x):
     if isinstance(x, float):
         return "{:.8f}".format(x)
+    elif isinstance(x, Decimal):
+        # str() writes small decimals like 5E-7 in scientific notation, which Binance rejects
+        return "{:f}".format(x)
     else:
         return str(x)
@@ -0,0 +1,94 @@
+import heapq
+import numpy as np
+
+
+class Converter(object):
+    """
+    Values assets in one valuation currency through the cheapest chain of markets between them.
+
+    Markets form a graph of assets, a symbol BASEQUOTE priced p converts BASE to QUOTE at p and QUOTE to BASE at 1/p.
+    The path of every asset is found once, cheapest by trade fee plus half the bid/ask spread per hop, and stored
+    as a row of +1/-1 exponents over the symbols it crosses. Valuing every asset is then one matrix product of the
+    exponents with the log prices.
+    """
+    def __init__(self, markets, assets, valuation="USDT", spreads=None, hop_cost=0.001):
+        """
+        Args:
+            markets (dict): symbol to (base asset, quote asset), e.g. from ExchangeInfo
+            assets (list): assets to value, in the order rates() returns them
+            valuation (str, optional): currency assets are valued in
+            spreads (dict, optional): symbol to relative bid/ask spread, e.g. from spreads(); markets without one
+                cost hop_cost alone
+            hop_cost (float, optional): relative cost of every conversion, the trade fee
+        """
+        self.valuation = valuation
+        self.assets = list(assets)
+        self.paths = shortest_paths(markets, valuation, spreads or {}, hop_cost)
+
+        missing = [asset for asset in self.assets if asset not in self.paths]
+        if missing:
+            raise ValueError("No market path from {0} to {1}".format(", ".join(missing), valuation))
+
+        self.symbols = sorted({symbol for asset in self.assets for symbol, _ in self.paths[asset]})
+        self.column = {symbol: j for j, symbol in enumerate(self.symbols)}
+        self.exponents = np.zeros((len(self.assets), len(self.symbols)))
+        for i, asset in enumerate(self.assets):
+            for symbol, exponent in self.paths[asset]:
+                self.exponents[i, self.column[symbol]] += exponent
+        self.dependents = {symbol: np.flatnonzero(self.exponents[:, j]) for symbol, j in self.column.items()}
+
+    def vector(self, prices):
+        """Prices of the path symbols out of a full prices() snapshot, as floats in column order"""
+        return np.array([float(prices[symbol]) for symbol in self.symbols])
+
+    def rates(self, vector, rows=None):
+        """Value of one unit of every asset, or of the assets at rows, given a vector() of path prices"""
+        exponents = self.exponents if rows is None else self.exponents[rows]
+        return np.exp(exponents @ np.log(vector))
+
+
+def shortest_paths(markets, valuation, spreads, hop_cost):
+    """Cheapest path of markets from every reachable asset to the valuation currency.
+
+    Returns:
+        dict: asset to a list of (symbol, exponent), exponent 1 to sell the asset as a base and -1 to buy with it as
+            the quote
+
+    """
+    edges = {}
+    for symbol, (base, quote) in markets.items():
+        cost = hop_cost + spreads.get(symbol, 0.0) / 2
+        edges.setdefault(base, []).append((quote, symbol, 1, cost))
+        edges.setdefault(quote, []).append((base, symbol, -1, cost))
+
+    # Dijkstra outwards from the valuation currency, so each asset's path is walked back towards it
+    costs = {valuation: 0.0}
+    paths = {valuation: []}
+    heap = [(0.0, valuation)]
+    while heap:
+        cost, asset = heapq.heappop(heap)
+        if cost > costs[asset]:
+            continue
+        for neighbour, symbol, exponent, hop in edges.get(asset, ()):
+            if cost + hop < costs.get(neighbour, float("inf")):
+                costs[neighbour] = cost + hop
+                # Converting neighbour to asset crosses the same symbol the other way round
+                paths[neighbour] = [(symbol, -exponent)] + paths[asset]
+                heapq.heappush(heap, (cost + hop, neighbour))
+    return paths
+
+
+def markets(exchange_info):
+    """Symbol to (base, quote) of every trading symbol of an ExchangeInfo index"""
+    return {filters.symbol: (filters.base_asset, filters.quote_asset) for filters in exchange_info.symbols()
+            if filters.status in (None, "TRADING") and filters.base_asset and filters.quote_asset}
+
+
+def spreads(tickers):
+    """Relative bid/ask spread of every symbol of a binance_api.tickers() snapshot with both sides quoted"""
+    spreads = {}
+    for symbol, ticker in tickers.items():
+        bid, ask = float(ticker["bid"]), float(ticker["ask"])
+        if bid > 0 and ask > 0:
+            spreads[symbol] = ask / bid - 1
+    return spreads
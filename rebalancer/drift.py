@@ -0,0 +1,26 @@
+import numpy as np
+from rebalancer.portfolio import Portfolio
+
+
+class DriftTracker(Portfolio):
+    """Portfolio weights kept up to date one streamed price at a time, checked against a drift band."""
+    __slots__ = ("band",)
+
+    def __init__(self, symbols, targets, band, base="BTCUSDT", converter=None):
+        """
+        Args:
+            symbols (list)
+            targets (list): target weights, in symbols order
+            band (float): absolute drift from a target weight that triggers a rebalance, e.g. 0.02
+            base (str, optional): USD quoted symbol the others are valued through, without a converter
+            converter (conversion.Converter, optional): see Portfolio
+        """
+        super().__init__(symbols, targets, base=base, converter=converter)
+        self.band = band
+
+    def max_drift(self):
+        return float(np.abs(self.diffs()).max())
+
+    def breached(self):
+        """Whether any coin has drifted further than the band from its target"""
+        return self.max_drift() > self.band
@@ -0,0 +1,169 @@
+import numpy as np
+from collections import namedtuple
+
+
+BacktestResult = namedtuple("BacktestResult", ["rebalance", "hodl", "volumes", "trades", "balances"])
+
+
+def usd_prices(closes, base_index):
+    """Converts BTC quoted closes to USD prices.
+
+    Every column except base_index is quoted in BTC and is multiplied by the BTCUSDT close of the same tick,
+    the base column is already in USD and is left as is.
+
+    Args:
+        closes (array): (..., ticks, symbols) close prices
+        base_index (int): column of BTCUSDT
+
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    usd = closes * closes[..., base_index:base_index + 1]
+    usd[..., base_index] = closes[..., base_index]
+    return usd
+
+
+def run_backtest(prices_usd, balances, hodl_balances, targets, fee, base_index, threshold=0.0, volume_of_trades=0.0,
+                 record_trades=True, fills=None, candles=None):
+    """Rebalances a portfolio at every tick of a USD price matrix.
+
+    Mirrors BackTester.update() followed by update_portfolio_balances() and update() for every tick, but keeps
+    prices and balances in contiguous arrays. Every coin except the base coin is traded back to its target at each
+    tick, the base coin (BTC) pays for the trades. The HODL series only depends on prices so is computed in one
+    matrix product; the rebalanced series is a recurrence over ticks with every tick computed with array operations
+    over all symbols (and all paths when a leading batch dimension is given).
+
+    Args:
+        prices_usd (array): (..., ticks, symbols) USD prices, see usd_prices()
+        balances (array): (..., symbols) starting balances of the rebalanced portfolio
+        hodl_balances (array): (..., symbols) balances of the HODL portfolio
+        targets (array): (..., symbols) target percentages
+        fee (float): transaction fee taken from every purchase volume
+        base_index (int): column of the coin paying for trades
+        threshold (float, optional): drift from target a coin needs before it is traded, 0 trades every tick
+        volume_of_trades (float, optional): cumulative traded volume before the first tick
+        record_trades (bool, optional): build the cumulative volume/trades series, single path only
+        fills (fills.CandleFills, optional): fills every rebalance through limit orders against the following candles
+            instead of instantly at the close
+        candles (dict, optional): with fills, (..., ticks, symbols) close, high, low and volume arrays in each
+            symbol's quote asset, aligned with prices_usd
+
+    Returns:
+        BacktestResult: rebalance and hodl totals (..., ticks), volumes and trades series (None if not recorded)
+        and the final balances (..., symbols)
+
+    """
+    prices_usd = np.asarray(prices_usd, dtype=np.float64)
+    ticks = prices_usd.shape[-2]
+    balances = np.array(np.broadcast_to(balances, prices_usd.shape[:-2] + prices_usd.shape[-1:]), dtype=np.float64)
+    targets = np.asarray(targets, dtype=np.float64)
+    record_trades = record_trades and prices_usd.ndim == 2
+
+    # Balance held constant, so HODLing is one product over the whole history
+    hodl = np.einsum("...ts,...s->...t", prices_usd, np.asarray(hodl_balances, dtype=np.float64))
+
+    traded = np.ones(prices_usd.shape[-1], dtype=bool)
+    traded[base_index] = False
+    keep = np.where(traded, 1 - fee, 0.0)
+    pays = traded.astype(np.float64)
+
+    rebalance = np.empty(prices_usd.shape[:-1])
+    pre_totals = np.empty(prices_usd.shape[:-1])
+    trade_volumes = np.empty(prices_usd.shape) if record_trades else None
+
+    if fills is not None:
+        run_fills(prices_usd, balances, targets, fee, base_index, threshold, traded, fills, candles, rebalance,
+                  pre_totals, trade_volumes)
+        return result(rebalance, hodl, pre_totals, trade_volumes, traded, volume_of_trades, balances)
+
+    total_usd = np.empty_like(balances)
+    volumes = np.empty_like(balances)
+    bought = np.empty_like(balances)
+
+    for tick in range(ticks):
+        prices = prices_usd[..., tick, :]
+        np.multiply(balances, prices, out=total_usd)
+        total = total_usd.sum(axis=-1)
+
+        # percentage_diffs * total, i.e. the USD trade volume that takes every coin back to its target
+        np.multiply(targets, total[..., None], out=volumes)
+        volumes -= total_usd
+        if threshold:
+            volumes *= np.abs(volumes) >= threshold * total[..., None]
+        paid = volumes @ pays
+
+        # Bought coins lose the fee, the base coin pays the full trade volume
+        np.divide(volumes, prices, out=bought)
+        bought *= keep
+        balances += bought
+        balances[..., base_index] -= paid / prices[..., base_index]
+
+        pre_totals[..., tick] = total
+        rebalance[..., tick] = total - fee * paid
+        if record_trades:
+            trade_volumes[..., tick, :] = volumes
+
+    return result(rebalance, hodl, pre_totals, trade_volumes, traded, volume_of_trades, balances)
+
+
+def run_fills(prices_usd, balances, targets, fee, base_index, threshold, traded, fills, candles, rebalance, pre_totals,
+              trade_volumes):
+    """The run_backtest() recurrence with orders filled by a fill model, updating balances and the series in place.
+
+    Each tick first fills the orders still open against its candle and cancels the expired ones, then places the
+    orders that take every coin back to its target. A coin whose order is placed replaces the order it had open,
+    coins under the threshold leave theirs open until they expire.
+    """
+    closes = np.asarray(candles["close"], dtype=np.float64)
+    high = np.asarray(candles["high"], dtype=np.float64)
+    low = np.asarray(candles["low"], dtype=np.float64)
+    volume = np.asarray(candles["volume"], dtype=np.float64)
+
+    keep = np.where(traded, 1 - fee, 0.0)
+    pays = traded.astype(np.float64)
+    quantities = np.zeros_like(balances)
+    limits = np.zeros_like(balances)
+    ages = np.zeros(balances.shape, dtype=np.int64)
+
+    for tick in range(prices_usd.shape[-2]):
+        prices = prices_usd[..., tick, :]
+        # USD value of one unit of each symbol's quote asset
+        quote_usd = prices / closes[..., tick, :]
+        pre_totals[..., tick] = (balances * prices).sum(axis=-1)
+
+        filled = fills.fills(quantities, limits, high[..., tick, :], low[..., tick, :], volume[..., tick, :])
+        filled_volumes = filled * limits * quote_usd
+        balances += filled * keep
+        balances[..., base_index] -= (filled_volumes @ pays) / prices[..., base_index]
+        quantities -= filled
+        ages += 1
+        quantities *= ages < fills.expiry
+
+        total_usd = balances * prices
+        total = total_usd.sum(axis=-1)
+        rebalance[..., tick] = total
+        if trade_volumes is not None:
+            trade_volumes[..., tick, :] = filled_volumes
+
+        volumes = targets * total[..., None] - total_usd
+        if threshold:
+            volumes *= np.abs(volumes) >= threshold * total[..., None]
+        volumes *= traded
+        placed, placed_limits = fills.orders(volumes / prices, closes[..., tick, :])
+        replace = volumes != 0
+        quantities = np.where(replace, placed, quantities)
+        limits = np.where(replace, placed_limits, limits)
+        ages = np.where(replace, 0, ages)
+
+
+def result(rebalance, hodl, pre_totals, trade_volumes, traded, volume_of_trades, balances):
+    if trade_volumes is None:
+        return BacktestResult(rebalance, hodl, None, None, balances)
+
+    # update_portfolio_balances() walks the coins from largest to smallest percentage diff, trade volumes are the
+    # diffs scaled by the (positive) portfolio total so sort the same way
+    order = np.argsort(-trade_volumes[:, traded], axis=1, kind="stable")
+    sorted_volumes = np.take_along_axis(np.abs(trade_volumes[:, traded]), order, axis=1)
+    cumulative_volumes = volume_of_trades + np.cumsum(sorted_volumes.ravel())
+    trades = np.repeat(pre_totals / hodl - 1, traded.sum())
+
+    return BacktestResult(rebalance, hodl, cumulative_volumes, trades, balances)
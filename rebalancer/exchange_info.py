@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+import time
+import rebalancer.binance_api as api
+
+
+class SymbolFilters(object):
+    """Trading rules of one symbol, parsed from its exchangeInfo filters into numbers."""
+    __slots__ = ("symbol", "base_asset", "quote_asset", "status",
+                 "min_qty", "max_qty", "step_size",
+                 "min_price", "max_price", "tick_size",
+                 "min_notional")
+
+    def __init__(self, symbol, base_asset, quote_asset, status, min_qty=0.0, max_qty=0.0, step_size=0.0,
+                 min_price=0.0, max_price=0.0, tick_size=0.0, min_notional=0.0):
+        self.symbol = symbol
+        self.base_asset = base_asset
+        self.quote_asset = quote_asset
+        self.status = status
+        self.min_qty = min_qty
+        self.max_qty = max_qty
+        self.step_size = step_size
+        self.min_price = min_price
+        self.max_price = max_price
+        self.tick_size = tick_size
+        self.min_notional = min_notional
+
+    @classmethod
+    def from_exchange_info(cls, info):
+        """Builds the filters of one entry of exchangeInfo["symbols"]"""
+        fields = {}
+        for filters in info["filters"]:
+            if filters["filterType"] == "LOT_SIZE":
+                fields.update(min_qty=float(filters["minQty"]), max_qty=float(filters["maxQty"]),
+                              step_size=float(filters["stepSize"]))
+            elif filters["filterType"] == "PRICE_FILTER":
+                fields.update(min_price=float(filters["minPrice"]), max_price=float(filters["maxPrice"]),
+                              tick_size=float(filters["tickSize"]))
+            elif filters["filterType"] in ("MIN_NOTIONAL", "NOTIONAL"):
+                fields.update(min_notional=float(filters["minNotional"]))
+        return cls(info["symbol"], info.get("baseAsset"), info.get("quoteAsset"), info.get("status"), **fields)
+
+    def to_list(self):
+        return [getattr(self, name) for name in self.__slots__]
+
+
+class ExchangeInfo(object):
+    """
+    Symbol filter index kept in memory and cached on disk. The full exchangeInfo payload is only downloaded when the
+    cache is missing or older than its TTL; a stale cache is still served while a background thread refreshes it.
+    """
+    def __init__(self, path="./rebalancer/exchange_info.json", ttl=24 * 60 * 60):
+        """
+        Args:
+            path (str, optional): cache file of the parsed index
+            ttl (float, optional): seconds before the cache is refreshed
+        """
+        self.path = path
+        self.ttl = ttl
+        self.index = {}
+        self.fetched = 0
+
+        self.refreshing = None
+        self.lock = threading.Lock()
+
+        if not self.load():
+            self.refresh()
+
+    def __getitem__(self, symbol):
+        self.check_expiry()
+        return self.index[symbol]
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    def symbols(self):
+        self.check_expiry()
+        return self.index.values()
+
+    def load(self):
+        """Loads the cached index, returns False if there is none"""
+        try:
+            with open(self.path, "r") as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            return False
+
+        self.index = {values[0]: SymbolFilters(*values) for values in cache["symbols"]}
+        self.fetched = cache["fetched"]
+        return True
+
+    def refresh(self):
+        """Downloads exchangeInfo, rebuilds the index and rewrites the cache"""
+        info = api.get_exchange_info()
+        index = {symbols["symbol"]: SymbolFilters.from_exchange_info(symbols) for symbols in info["symbols"]}
+        fetched = time.time()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".tmp", "w") as file:
+            json.dump({"fetched": fetched, "symbols": [filters.to_list() for filters in index.values()]}, file)
+        os.replace(self.path + ".tmp", self.path)
+
+        self.index = index
+        self.fetched = fetched
+
+    def check_expiry(self):
+        """Starts a background refresh once the index is older than the TTL"""
+        if time.time() - self.fetched < self.ttl:
+            return
+        with self.lock:
+            if self.refreshing is None or not self.refreshing.is_alive():
+                self.refreshing = threading.Thread(target=self.refresh, name="exchange_info", daemon=True)
+                self.refreshing.start()
@@ -0,0 +1,196 @@
+from collections import namedtuple
+from decimal import Decimal, ROUND_DOWN, ROUND_UP
+import numpy as np
+
+
+BUY = "BUY"
+SELL = "SELL"
+
+Order = namedtuple("Order", ["symbol", "side", "quantity", "price"])
+Child = namedtuple("Child", ["price", "quantity"])
+Plan = namedtuple("Plan", ["side", "children", "average_price", "slippage", "unplanned"])
+
+
+class Book(object):
+    """
+    Order book levels of one symbol, best first, as (price, quantity) floats alongside the exchange's own price
+    strings so orders can be placed exactly on a level.
+    """
+    __slots__ = ("symbol", "bids", "asks", "bid_prices", "ask_prices")
+
+    def __init__(self, symbol, bids, asks):
+        """
+        Args:
+            symbol (str)
+            bids (dict): price to quantity strings, as returned by binance_api.depth()
+            asks (dict): price to quantity strings
+        """
+        self.symbol = symbol
+        bids = sorted(bids.items(), key=lambda level: -float(level[0]))
+        asks = sorted(asks.items(), key=lambda level: float(level[0]))
+        self.bids = [(float(price), float(quantity)) for price, quantity in bids]
+        self.asks = [(float(price), float(quantity)) for price, quantity in asks]
+        self.bid_prices = [price for price, _ in bids]
+        self.ask_prices = [price for price, _ in asks]
+
+    @classmethod
+    def from_depth(cls, symbol, depth):
+        return cls(symbol, depth["bids"], depth["asks"])
+
+    def levels(self, side):
+        """Levels a side's orders take liquidity from, asks for a BUY and bids for a SELL"""
+        if side == BUY:
+            return self.asks, self.ask_prices
+        return self.bids, self.bid_prices
+
+    def mid(self):
+        if not self.bids or not self.asks:
+            return None
+        return (self.bids[0][0] + self.asks[0][0]) / 2
+
+
+def floor_step(quantity, step_size):
+    """Rounds a quantity down to a multiple of the LOT_SIZE step, as a Decimal"""
+    quantity = Decimal(repr(float(quantity)))
+    if not step_size:
+        return quantity
+    step = Decimal(repr(float(step_size)))
+    return (quantity / step).to_integral_value(rounding=ROUND_DOWN) * step
+
+
+def round_tick(price, tick_size, side):
+    """Rounds a price to a multiple of the PRICE_FILTER tick, as a Decimal, down for a BUY and up for a SELL so the
+    order never trades at a worse price than asked"""
+    price = Decimal(price) if isinstance(price, str) else Decimal(repr(float(price)))
+    if not tick_size:
+        return price
+    tick = Decimal(repr(float(tick_size)))
+    return (price / tick).to_integral_value(rounding=ROUND_DOWN if side == BUY else ROUND_UP) * tick
+
+
+def batch(symbols, quantities, prices, filters):
+    """Every order of a rebalance at once, rounded and checked against the symbol filters before any is sent.
+
+    Orders that clearly miss the LOT_SIZE minimum or MIN_NOTIONAL at the last price are dropped in one array pass,
+    the rest are rounded with exact decimals, quantities down to the step size and prices to the tick size, and
+    checked again.
+
+    Args:
+        symbols (list)
+        quantities (array): base asset quantity of each symbol to buy, negative to sell, 0 or NaN for none
+        prices (array): last price of each symbol in its quote asset
+        filters (list): exchange_info.SymbolFilters of each symbol
+
+    Returns:
+        list: Order(symbol, side, Decimal quantity, Decimal price) of the orders that clear the filters
+
+    """
+    quantities = np.nan_to_num(np.asarray(quantities, dtype=np.float64))
+    prices = np.asarray(prices, dtype=np.float64)
+    min_qty = np.array([f.min_qty for f in filters], dtype=np.float64)
+    min_notional = np.array([f.min_notional for f in filters], dtype=np.float64)
+    sizes = np.abs(quantities)
+    candidates = np.flatnonzero((sizes > 0) & (sizes >= min_qty) & (sizes * prices >= min_notional))
+
+    orders = []
+    for i in candidates.tolist():
+        side = BUY if quantities[i] > 0 else SELL
+        quantity = floor_step(sizes[i], filters[i].step_size)
+        price = round_tick(prices[i], filters[i].tick_size, side)
+        if valid(quantity, float(price), filters[i].min_qty, filters[i].min_notional):
+            orders.append(Order(symbols[i], side, quantity, price))
+    return orders
+
+
+def valid(quantity, price, min_qty, min_notional):
+    """Whether a child clears the LOT_SIZE minimum and MIN_NOTIONAL filters"""
+    return quantity > 0 and quantity >= Decimal(repr(float(min_qty))) and float(quantity) * price >= min_notional
+
+
+def walk(levels, quantity):
+    """Average price of taking quantity from the levels best first, None if the book is too thin.
+
+    Args:
+        levels (list): (price, quantity) best first
+        quantity (float)
+
+    """
+    remaining = quantity
+    cost = 0.0
+    for price, available in levels:
+        take = min(remaining, available)
+        cost += take * price
+        remaining -= take
+        if remaining <= 0:
+            return cost / quantity
+    return None
+
+
+def plan(side, quantity, book, step_size=0.0, min_qty=0.0, min_notional=0.0, participation=1.0, max_slippage=0.005,
+         max_children=5, tick_size=0.0):
+    """Splits an order into limit children priced on the book, within a slippage budget.
+
+    The book is walked from the touch, taking up to participation of the quantity shown on each level. Consecutive
+    levels are grouped into children of at least quantity / max_children, each priced at the deepest level it
+    reaches so it fills against everything in front of it. Levels further than max_slippage from the touch are not
+    used, whatever is left over is returned as unplanned and is picked up by the next rebalance.
+
+    Args:
+        side (str): BUY or SELL
+        quantity (float): base asset quantity, positive
+        book (Book)
+        step_size (float, optional): LOT_SIZE step children are rounded down to
+        min_qty (float, optional): smallest child quantity
+        min_notional (float, optional): smallest child price * quantity
+        participation (float, optional): fraction of each level's quantity taken
+        max_slippage (float, optional): furthest a child is priced from the touch, relative
+        max_children (int, optional): children the order is split into at most
+        tick_size (float, optional): PRICE_FILTER tick children are priced on
+
+    Returns:
+        Plan: children as Child(plain decimal price string, Decimal quantity), the expected average fill price, the
+            expected slippage against the mid price and the unplanned quantity
+
+    """
+    if side not in (BUY, SELL):
+        raise ValueError("Unknown order side: {0}".format(side))
+    levels, prices = book.levels(side)
+    if quantity <= 0 or not levels:
+        return Plan(side, [], None, None, max(quantity, 0.0))
+
+    touch = levels[0][0]
+    child_size = quantity / max(max_children, 1)
+    children = []
+    planned = 0.0
+    pending = 0.0
+    last = None
+    for (price, available), price_string in zip(levels, prices):
+        if abs(price / touch - 1) > max_slippage:
+            break
+        pending += min(quantity - planned - pending, available * participation)
+        last = price, price_string
+        if pending < child_size and planned + pending < quantity:
+            continue
+        child = floor_step(pending, step_size)
+        if valid(child, price, min_qty, min_notional):
+            children.append(Child("{:f}".format(round_tick(price_string, tick_size, side)), child))
+            planned += float(child)
+            pending = 0.0
+        if planned >= quantity or len(children) == max_children:
+            break
+
+    # The budget or the book ran out before the last child filled up, it takes what was reached
+    if pending > 0 and last is not None and len(children) < max_children:
+        child = floor_step(pending, step_size)
+        if valid(child, last[0], min_qty, min_notional):
+            children.append(Child("{:f}".format(round_tick(last[1], tick_size, side)), child))
+            planned += float(child)
+
+    # Children only take participation of each level, so the fill is walked over those shares of the book
+    average_price = walk([(price, available * participation) for price, available in levels], planned) \
+        if planned else None
+    slippage = None
+    mid = book.mid()
+    if average_price is not None and mid:
+        slippage = average_price / mid - 1 if side == BUY else 1 - average_price / mid
+    return Plan(side, children, average_price, slippage, max(quantity - planned, 0.0))
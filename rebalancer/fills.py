@@ -0,0 +1,94 @@
+import math
+import numpy as np
+
+
+class CandleFills(object):
+    """
+    Fills backtest orders against the candles that follow them instead of instantly at the close.
+
+    Every rebalance places one limit order per coin at the close, floored to the lot step size and rejected below the
+    minimum quantity or notional. An order only fills during a later candle whose low (to buy) or high (to sell)
+    reaches its price, for at most a share of that candle's volume, and is cancelled once it has been open for as
+    long as open_order_time_limit allows. Each step works on every symbol, and every path, with array operations.
+    """
+    def __init__(self, min_qty, step_size, min_notional, participation=0.1, limit_offset=0.0, expiry=1, window=1.0):
+        """
+        Args:
+            min_qty (array): (symbols) LOT_SIZE minimum quantities
+            step_size (array): (symbols) LOT_SIZE step sizes, 0 for none
+            min_notional (array): (symbols) minimum order values in the quote asset
+            participation (float, optional): share of a candle's volume an order may fill
+            limit_offset (float, optional): relative distance of the limit price from the close, below it to buy and
+                above it to sell
+            expiry (int, optional): candles an order stays open before it is cancelled, see lifetime()
+            window (float, optional): share of each candle an order is open for, below 1 when orders are cancelled
+                sooner than a candle closes
+        """
+        self.min_qty = np.asarray(min_qty, dtype=np.float64)
+        self.step_size = np.asarray(step_size, dtype=np.float64)
+        self.min_notional = np.asarray(min_notional, dtype=np.float64)
+        self.participation = participation
+        self.limit_offset = limit_offset
+        self.expiry = expiry
+        self.window = window
+
+    @classmethod
+    def from_exchange_info(cls, exchange_info, symbols, **kwargs):
+        """Builds the lot size and notional filters of symbols out of an ExchangeInfo index"""
+        filters = [exchange_info[symbol] for symbol in symbols]
+        return cls([f.min_qty for f in filters], [f.step_size for f in filters], [f.min_notional for f in filters],
+                   **kwargs)
+
+    @staticmethod
+    def lifetime(time_limit, interval_ms):
+        """
+        Args:
+            time_limit (float): open_order_time_limit in milliseconds
+            interval_ms (int): length of a candle in milliseconds
+
+        Returns:
+            tuple: candles an order stays open, and the share of each candle it is open for
+
+        """
+        if not time_limit or not interval_ms:
+            return 1, 1.0
+        candles = max(1, math.ceil(time_limit / interval_ms))
+        return candles, min(1.0, time_limit / interval_ms)
+
+    def orders(self, quantities, closes):
+        """Orders placed at the close for the quantities a rebalance asks for.
+
+        Args:
+            quantities (array): (..., symbols) quantities to buy, negative to sell
+            closes (array): (..., symbols) closes in each symbol's quote asset
+
+        Returns:
+            tuple: (..., symbols) signed quantities floored to the step size, 0 where rejected, and limit prices in
+                the quote asset
+
+        """
+        sizes = np.abs(quantities)
+        # The small tolerance keeps quantities already on a step from being floored a whole step down
+        steps = np.where(self.step_size > 0, self.step_size, 1.0)
+        sizes = np.where(self.step_size > 0, np.floor(sizes / steps + 1e-9) * steps, sizes)
+        prices = np.where(quantities > 0, closes * (1 - self.limit_offset), closes * (1 + self.limit_offset))
+        valid = (sizes > 0) & (sizes >= self.min_qty) & (sizes * prices >= self.min_notional)
+        return np.copysign(sizes, quantities) * valid, prices
+
+    def fills(self, quantities, prices, high, low, volume):
+        """Share of open orders that fills during one candle.
+
+        Args:
+            quantities (array): (..., symbols) signed quantities still open
+            prices (array): (..., symbols) limit prices
+            high (array): (..., symbols) candle highs
+            low (array): (..., symbols) candle lows
+            volume (array): (..., symbols) candle base asset volumes
+
+        Returns:
+            array: (..., symbols) signed filled quantities
+
+        """
+        crossed = np.where(quantities > 0, low <= prices, high >= prices)
+        available = self.participation * self.window * volume
+        return np.sign(quantities) * np.minimum(np.abs(quantities), available) * crossed
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+import rebalancer.binance_api as api
+from concurrent.futures import ThreadPoolExecutor
+
+
+MAX_LIMIT = 1000
+
+# Length of every candle_time in milliseconds, a month is taken at its longest as pages only need an upper bound
+INTERVAL_MS = {
+    "1m": 60 * 1000,
+    "3m": 3 * 60 * 1000,
+    "5m": 5 * 60 * 1000,
+    "15m": 15 * 60 * 1000,
+    "30m": 30 * 60 * 1000,
+    "1h": 60 * 60 * 1000,
+    "2h": 2 * 60 * 60 * 1000,
+    "4h": 4 * 60 * 60 * 1000,
+    "6h": 6 * 60 * 60 * 1000,
+    "8h": 8 * 60 * 60 * 1000,
+    "12h": 12 * 60 * 60 * 1000,
+    "1d": 24 * 60 * 60 * 1000,
+    "3d": 3 * 24 * 60 * 60 * 1000,
+    "1w": 7 * 24 * 60 * 60 * 1000,
+    "1M": 31 * 24 * 60 * 60 * 1000,
+}
+
+
+def pages(start, end, interval, limit=MAX_LIMIT):
+    """Splits [start, end) into (startTime, endTime) windows that each fit in one klines request.
+
+    Args:
+        start (int): milliseconds, inclusive
+        end (int): milliseconds, exclusive
+        interval (str)
+        limit (int, optional): candles per request
+
+    """
+    span = INTERVAL_MS[interval] * limit
+    return [(page_start, min(page_start + span, end) - 1) for page_start in range(int(start), int(end), span)]
+
+
+def fetch_ranges(ranges, interval, max_workers=8, limit=MAX_LIMIT):
+    """Fetches the klines of several symbols, each over its own time range.
+
+    Every page of every symbol is sent through one bounded thread pool, then the pages of each symbol are stitched
+    back together in openTime order with overlapping candles dropped.
+
+    Args:
+        ranges (dict): symbol to (start, end) milliseconds, end exclusive
+        interval (str)
+        max_workers (int, optional): maximum requests in flight
+        limit (int, optional): candles per request
+
+    Returns:
+        dict: symbol to list of kline dicts, see binance_api.klines()
+
+    """
+    jobs = [(symbol, page) for symbol, (start, end) in ranges.items() for page in pages(start, end, interval, limit)]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(lambda job: api.klines(job[0], interval=interval, limit=limit,
+                                                      startTime=job[1][0], endTime=job[1][1]), jobs)
+        fetched = {symbol: {} for symbol in ranges}
+        for (symbol, _), klines in zip(jobs, results):
+            for kline in klines:
+                fetched[symbol][kline["openTime"]] = kline
+
+    return {symbol: [klines[open_time] for open_time in sorted(klines)] for symbol, klines in fetched.items()}
+
+
+def align(closes, interval, fill="ffill"):
+    """Stitches close price series into one frame without gaps.
+
+    The frame covers the closeTimes every symbol has history for, on a regular candle_time grid. A candle missing from
+    the exchange, e.g. during maintenance, carries the previous close forward.
+
+    Args:
+        closes (dict): symbol to pd.Series of closes indexed by closeTime
+        interval (str)
+        fill (optional): "ffill" carries the previous value into a missing candle, a number fills it with that
+            number and None leaves it NaN, e.g. 0 for volumes, which no missing candle traded
+
+    Returns:
+        pd.DataFrame: one column per symbol, in the order given
+
+    """
+    frame = pd.DataFrame(closes, columns=list(closes))
+    if not closes or any(series.empty for series in closes.values()):
+        return frame.iloc[0:0]
+
+    start = max(series.index.min() for series in closes.values())
+    end = min(series.index.max() for series in closes.values())
+    frame = frame[(frame.index >= start) & (frame.index <= end)]
+
+    if fill != "ffill":
+        if interval != "1M":
+            frame = frame.reindex(np.arange(start, end + 1, INTERVAL_MS[interval], dtype=np.int64))
+        return frame if fill is None else frame.fillna(fill)
+
+    if interval != "1M":
+        grid = np.arange(start, end + 1, INTERVAL_MS[interval], dtype=np.int64)
+        frame = frame.reindex(frame.index.union(grid)).ffill().reindex(grid)
+    return frame.ffill()
+
+
+def fetch_history(symbols, interval, start, end, max_workers=8):
+    """Fetches the close prices of symbols over [start, end) as one aligned frame.
+
+    Args:
+        symbols (list)
+        interval (str)
+        start (int): milliseconds, inclusive
+        end (int): milliseconds, exclusive
+        max_workers (int, optional): maximum requests in flight
+
+    Returns:
+        pd.DataFrame: close prices indexed by closeTime, see align()
+
+    """
+    fetched = fetch_ranges({symbol: (start, end) for symbol in symbols}, interval, max_workers=max_workers)
+    return align({symbol: pd.Series([float(kline["close"]) for kline in klines],
+                                    index=[kline["closeTime"] for kline in klines], dtype=np.float64)
+                  for symbol, klines in fetched.items()}, interval)
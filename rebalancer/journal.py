@@ -0,0 +1,142 @@
+import csv
+import json
+import os
+import time
+
+from rebalancer.orders import FIELDS, OpenOrders
+from rebalancer.recorder import ORDER
+
+
+PLACED = "placed"
+FILLED = "filled"
+CANCELLED = "cancelled"
+EXPIRED = "expired"
+
+EVENTS = (PLACED, FILLED, CANCELLED, EXPIRED)
+
+
+class OrderJournal(object):
+    """
+    Append-only journal of order events, one JSON line each, backed by a compacted snapshot of the open orders in
+    open_orders.csv. Steady state writes are a line appended per event rather than a rewrite of every open order,
+    and the open orders are rebuilt on restart by replaying the journal over the snapshot.
+    """
+    def __init__(self, path="./rebalancer/open_orders.journal", snapshot_path="./rebalancer/open_orders.csv",
+                 compact_every=1000, fsync=True, recorder=None):
+        """
+        Args:
+            path (str, optional): journal file
+            snapshot_path (str, optional): csv of the open orders at the last compaction
+            compact_every (int, optional): events appended before the journal is compacted into the snapshot
+            fsync (bool, optional): flush every event to disk before returning
+            recorder (recorder.Recorder, optional): also records every event
+        """
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.recorder = recorder
+        self.events = 0
+        self.file = None
+
+    def open(self):
+        if self.file is None:
+            # Terminate a line cut short by a crash so the next event starts on its own line
+            torn = False
+            if os.path.exists(self.path) and os.path.getsize(self.path):
+                with open(self.path, "rb") as file:
+                    file.seek(-1, os.SEEK_END)
+                    torn = file.read(1) != b"\n"
+            self.file = open(self.path, "a")
+            if torn:
+                self.file.write("\n")
+        return self.file
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def record(self, event, order):
+        """Appends an order event.
+
+        Args:
+            event (str): one of EVENTS
+            order (dict): order with at least FIELDS
+
+        """
+        if event not in EVENTS:
+            raise ValueError("Unknown order event: {0}".format(event))
+        entry = {"event": event, "at": int(time.time() * 1000), "order": {field: order[field] for field in FIELDS}}
+        file = self.open()
+        file.write(json.dumps(entry) + "\n")
+        file.flush()
+        if self.fsync:
+            os.fsync(file.fileno())
+        self.events += 1
+        if self.recorder is not None:
+            self.recorder.record(ORDER, entry, at=entry["at"])
+
+    def read_snapshot(self):
+        orders = OpenOrders()
+        if not os.path.exists(self.snapshot_path):
+            return orders
+        with open(self.snapshot_path, "r") as file:
+            for rows in csv.DictReader(file):
+                rows["orderId"] = int(rows["orderId"])
+                rows["time"] = int(float(rows["time"]))
+                orders.add(rows)
+        return orders
+
+    def replay(self):
+        """Rebuilds the open orders from the snapshot and every journaled event since.
+
+        A line cut short by a crash is ignored. Replaying is idempotent, so a crash between writing a snapshot
+        and truncating the journal loses nothing.
+
+        Returns:
+            OpenOrders
+
+        """
+        orders = self.read_snapshot()
+        if not os.path.exists(self.path):
+            return orders
+
+        with open(self.path, "r") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry["event"] == PLACED:
+                    orders.add(entry["order"])
+                else:
+                    orders.remove(entry["order"]["orderId"])
+                self.events += 1
+        return orders
+
+    def maybe_compact(self, orders):
+        """Compacts once compact_every events have been appended since the last compaction"""
+        if self.events >= self.compact_every:
+            self.compact(orders)
+
+    def compact(self, orders):
+        """Atomically replaces the snapshot with the current open orders, then truncates the journal.
+
+        Args:
+            orders (OpenOrders): current open orders
+
+        """
+        with open(self.snapshot_path + ".tmp", "w") as file:
+            writer = csv.DictWriter(file, fieldnames=FIELDS)
+            writer.writeheader()
+            for rows in orders:
+                writer.writerow(rows)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(self.snapshot_path + ".tmp", self.snapshot_path)
+
+        self.close()
+        with open(self.path, "w"):
+            pass
+        self.events = 0
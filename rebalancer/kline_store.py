@@ -0,0 +1,154 @@
+import os
+import numpy as np
+import pandas as pd
+import rebalancer.binance_api as api
+import rebalancer.history as history
+
+
+FIELDS = (("openTime", "<i8"),
+          ("open", "<f8"),
+          ("high", "<f8"),
+          ("low", "<f8"),
+          ("close", "<f8"),
+          ("volume", "<f8"),
+          ("closeTime", "<i8"),
+          ("quoteVolume", "<f8"),
+          ("numTrades", "<i8"))
+
+# How each field fills a candle missing from the history, the rest are left NaN
+GAP_FILLS = {"close": "ffill", "volume": 0.0, "quoteVolume": 0.0, "numTrades": 0}
+
+
+class KlineStore(object):
+    """
+    Persistent kline history kept on disk, one directory per (symbol, interval) holding one raw binary file per kline
+    field. Columns are appended to as new candles close and are memory-mapped when read, so loading history costs a
+    file open rather than a request per symbol.
+    """
+    def __init__(self, root="./rebalancer/klines"):
+        """
+        Args:
+            root (str): directory the store is kept in, created on first write
+        """
+        self.root = root
+
+    def path(self, symbol, interval):
+        return os.path.join(self.root, interval, symbol)
+
+    def count(self, symbol, interval):
+        """Number of complete candles stored, a column cut short by an interrupted append is ignored"""
+        path = self.path(symbol, interval)
+        sizes = []
+        for name, dtype in FIELDS:
+            file_name = os.path.join(path, name + ".bin")
+            if not os.path.exists(file_name):
+                return 0
+            sizes.append(os.path.getsize(file_name) // np.dtype(dtype).itemsize)
+        return min(sizes)
+
+    def load(self, symbol, interval):
+        """Memory-maps the stored candles of a symbol.
+
+        Returns:
+            dict: field name to read-only array, empty arrays if nothing is stored
+
+        """
+        path = self.path(symbol, interval)
+        length = self.count(symbol, interval)
+        if not length:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in FIELDS}
+        return {name: np.memmap(os.path.join(path, name + ".bin"), dtype=dtype, mode="r", shape=(length,))
+                for name, dtype in FIELDS}
+
+    def last_close_time(self, symbol, interval):
+        """closeTime of the newest stored candle, None if nothing is stored"""
+        length = self.count(symbol, interval)
+        if not length:
+            return None
+        return int(self.load(symbol, interval)["closeTime"][length - 1])
+
+    def append(self, symbol, interval, klines):
+        """Appends closed candles, in the binance_api.klines() format, that are newer than the stored history.
+
+        Args:
+            symbol (str)
+            interval (str)
+            klines (list): kline dicts sorted by openTime
+
+        Returns:
+            int: number of candles written
+
+        """
+        last = self.last_close_time(symbol, interval)
+        if last is not None:
+            klines = [kline for kline in klines if kline["openTime"] > last]
+        if not klines:
+            return 0
+
+        path = self.path(symbol, interval)
+        os.makedirs(path, exist_ok=True)
+        length = self.count(symbol, interval)
+        for name, dtype in FIELDS:
+            column = np.array([kline[name] for kline in klines], dtype=np.float64).astype(dtype)
+            with open(os.path.join(path, name + ".bin"), "ab") as file:
+                # Drop any partial tail left by an interrupted append before writing
+                file.truncate(length * np.dtype(dtype).itemsize)
+                file.write(column.tobytes())
+        return len(klines)
+
+    def sync(self, symbols, interval, start=None, max_workers=8):
+        """Fetches the candles of every symbol that closed since its last stored closeTime.
+
+        Pages of all symbols are fetched concurrently through history.fetch_ranges(). A symbol with nothing stored is
+        seeded from start, or with the latest 1000 candles if no start is given; history older than what is already
+        stored is never backfilled. The candle that is still open is never stored as its close would go stale.
+
+        Args:
+            symbols (list)
+            interval (str)
+            start (int, optional): milliseconds to seed empty symbols from
+            max_workers (int, optional): maximum requests in flight
+
+        Returns:
+            dict: symbol to number of candles written
+
+        """
+        now = api.get_server_time()
+        ranges = {}
+        for symbol in symbols:
+            last = self.last_close_time(symbol, interval)
+            if last is not None:
+                ranges[symbol] = (last + 1, now)
+            elif start is not None:
+                ranges[symbol] = (start, now)
+            else:
+                ranges[symbol] = (now - history.MAX_LIMIT * history.INTERVAL_MS[interval], now)
+
+        fetched = history.fetch_ranges(ranges, interval, max_workers=max_workers)
+        return {symbol: self.append(symbol, interval, [kline for kline in klines if kline["closeTime"] < now])
+                for symbol, klines in fetched.items()}
+
+    def closes(self, symbols, interval):
+        """Stored close prices of symbols, indexed by closeTime.
+
+        Args:
+            symbols (list): trading pairs, each becomes a column
+            interval (str)
+
+        Returns:
+            pd.DataFrame: close prices aligned by history.align()
+
+        """
+        return self.field(symbols, interval, "close")
+
+    def field(self, symbols, interval, name):
+        """Stored values of one kline field of symbols, e.g. high, low or volume, aligned like closes().
+
+        Only closes carry forward into candles missing from the history. Volumes and trade counts are 0 there, and any
+        other field is NaN, so nothing can fill against a candle that never traded.
+        """
+        series = {}
+        for symbol in symbols:
+            columns = self.load(symbol, interval)
+            series[symbol] = pd.Series(np.asarray(columns[name]), index=np.asarray(columns["closeTime"]))
+        return history.align(series, interval, fill=GAP_FILLS.get(name))
@@ -0,0 +1,190 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# When the process started, as near as the first import of this module, for startup timings
+STARTED = time.time()
+
+# Upper bounds in seconds, from a local request up to a stalled rebalance
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, float("inf"))
+
+
+class Histogram(object):
+    """Cumulative-bucket histogram of observed values, with their count, sum, min and max."""
+    __slots__ = ("buckets", "counts", "count", "sum", "min", "max")
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q quantile"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(bound, self.max)
+        return None
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.sum,
+                "min": self.min if self.count else None, "max": self.max if self.count else None,
+                "p50": self.quantile(0.5), "p90": self.quantile(0.9), "p99": self.quantile(0.99),
+                "buckets": {str(bound): count for bound, count in zip(self.buckets, self.counts)}}
+
+
+class Registry(object):
+    """
+    Thread-safe store of counters, gauges and histograms, each keyed by metric name and a set of labels such as the
+    endpoint or rebalance phase.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        with self.lock:
+            key = self.key(name, labels)
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[self.key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        with self.lock:
+            key = self.key(name, labels)
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observes the seconds spent in the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """All metrics as a JSON serialisable dict"""
+        def entries(metrics, value):
+            return [{"name": name, "labels": dict(labels), "value": value(metric)}
+                    for (name, labels), metric in sorted(metrics.items())]
+        with self.lock:
+            return {"time": time.time(),
+                    "counters": entries(self.counters, lambda metric: metric),
+                    "gauges": entries(self.gauges, lambda metric: metric),
+                    "histograms": entries(self.histograms, lambda metric: metric.to_dict())}
+
+    def to_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        def label_text(labels, extra=()):
+            labels = list(labels) + list(extra)
+            if not labels:
+                return ""
+            return "{" + ",".join('{0}="{1}"'.format(name, value) for name, value in labels) + "}"
+
+        lines = []
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append("{0}{1} {2}".format(name, label_text(labels), value))
+            for (name, labels), value in sorted(self.gauges.items()):
+                lines.append("{0}{1} {2}".format(name, label_text(labels), value))
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                seen = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    seen += count
+                    bound = "+Inf" if bound == float("inf") else bound
+                    lines.append("{0}_bucket{1} {2}".format(name, label_text(labels, [("le", bound)]), seen))
+                lines.append("{0}_sum{1} {2}".format(name, label_text(labels), histogram.sum))
+                lines.append("{0}_count{1} {2}".format(name, label_text(labels), histogram.count))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+inc = registry.inc
+set = registry.set
+observe = registry.observe
+timer = registry.timer
+
+
+class FileExporter(object):
+    """Rewrites a JSON snapshot of the registry every interval seconds from a background thread."""
+    def __init__(self, path, interval=60, registry=registry):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="metrics_exporter", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.export()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.export()
+
+    def export(self):
+        with open(self.path + ".tmp", "w") as file:
+            json.dump(self.registry.snapshot(), file, indent=1)
+        os.replace(self.path + ".tmp", self.path)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(self.server.registry.snapshot()), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = self.server.registry.to_prometheus(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host="127.0.0.1", registry=registry):
+    """Serves /metrics (Prometheus text) and /metrics.json from a background thread"""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, name="metrics_server", daemon=True).start()
+    return server
@@ -0,0 +1,440 @@
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import numpy as np
+import pandas as pd
+import rebalancer.rate_limit as rate_limit
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+QUOTE_ASSETS = ("USDT", "BTC", "ETH", "BNB")
+
+# Numbers Binance accepts for quantity and price, plain decimals without exponents
+NUMBER = re.compile(r"^([0-9]{1,20})(\.[0-9]{1,20})?$")
+
+
+def split_symbol(symbol):
+    """Returns the (base, quote) assets of a trading pair, e.g. ("ETH", "BTC") for ETHBTC"""
+    for quote in QUOTE_ASSETS:
+        if symbol.endswith(quote) and symbol != quote:
+            return symbol[:-len(quote)], quote
+    raise ValueError("Unknown quote asset for {0}".format(symbol))
+
+
+def synthetic_history(symbols, ticks=1000, interval_ms=60 * 1000, volatility=0.002, seed=None, end=None):
+    """Random walk close prices, BTC quoted pairs start between 0.0001 and 0.05 BTC and BTCUSDT at 10000.
+
+    Args:
+        symbols (list)
+        ticks (int, optional): candles per symbol
+        interval_ms (int, optional): candle length
+        volatility (float, optional): standard deviation of the log return per candle
+        seed (int, optional)
+        end (int, optional): closeTime of the last candle in milliseconds, defaults to now
+
+    Returns:
+        pd.DataFrame: close prices indexed by closeTime
+
+    """
+    rng = np.random.default_rng(seed)
+    end = end or int(time.time() * 1000)
+    index = end - interval_ms * np.arange(ticks)[::-1]
+    starts = np.array([10000.0 if split_symbol(symbol)[1] == "USDT" else rng.uniform(0.0001, 0.05)
+                       for symbol in symbols])
+    paths = starts * np.exp(np.cumsum(rng.normal(0, volatility, (ticks, len(symbols))), axis=0))
+    return pd.DataFrame(paths, index=index, columns=symbols)
+
+
+class MockExchange(object):
+    """
+    In-process stand-in for the Binance endpoints used by binance_api. Prices replay a close price history one row
+    per tick_seconds (or per step()), limit orders are matched against the current price, and latency and errors can
+    be injected to load test LiveTester without touching real funds.
+    """
+    def __init__(self, history, balances=None, start_row=0, tick_seconds=1.0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 rate_limited_rate=0.0, spread=0.001, step_size=0.001, tick_size=0.00000001, min_notional=0.001,
+                 seed=None):
+        """
+        Args:
+            history (pd.DataFrame): close prices indexed by closeTime, one column per symbol
+            balances (dict, optional): asset to free balance, defaults to 1 BTC
+            start_row (int, optional): first replayed row, earlier rows are only served as klines history
+            tick_seconds (float, optional): wall time per history row, 0 to only advance on step()
+            latency (float, optional): seconds added to every response
+            jitter (float, optional): up to this many extra random seconds per response
+            error_rate (float, optional): probability of a 500 response
+            rate_limited_rate (float, optional): probability of a 429 response
+            spread (float, optional): relative bid/ask spread around the current price
+            step_size (float, optional): LOT_SIZE stepSize and minQty of every symbol
+            tick_size (float, optional): PRICE_FILTER tickSize of every symbol
+            min_notional (float, optional): MIN_NOTIONAL of every symbol
+        """
+        self.history = history
+        self.closes = history.to_numpy(dtype=float)
+        self.symbols = list(history.columns)
+        self.columns = {symbol: column for column, symbol in enumerate(self.symbols)}
+
+        self.tick_seconds = tick_seconds
+        self.started = time.time()
+        self.row = min(start_row, len(self.closes) - 1)
+
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limited_rate = rate_limited_rate
+        self.spread = spread
+        self.step_size = step_size
+        self.tick_size = tick_size
+        self.min_notional = min_notional
+
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.order_ids = itertools.count(1)
+        self.orders = {}
+        self.trades = []
+        self.used_weight = {}
+
+        assets = set()
+        for symbol in self.symbols:
+            assets.update(split_symbol(symbol))
+        self.balances = {asset: {"free": 0.0, "locked": 0.0} for asset in assets}
+        for asset, amount in (balances or {"BTC": 1.0}).items():
+            self.balances.setdefault(asset, {"free": 0.0, "locked": 0.0})["free"] = float(amount)
+
+    def current_row(self):
+        if self.tick_seconds:
+            return min(len(self.closes) - 1, self.row + int((time.time() - self.started) / self.tick_seconds))
+        return self.row
+
+    def price(self, symbol):
+        return self.closes[self.current_row(), self.columns[symbol]]
+
+    def step(self, rows=1):
+        """Advances the replay and matches open orders against the new prices"""
+        with self.lock:
+            self.row = min(len(self.closes) - 1, self.row + rows)
+            self.match()
+
+    def match(self):
+        for order in list(self.orders.values()):
+            if order["status"] != "NEW":
+                continue
+            price = self.price(order["symbol"])
+            limit = float(order["price"])
+            if (order["side"] == "BUY" and limit >= price) or (order["side"] == "SELL" and limit <= price):
+                self.fill(order)
+
+    def fill(self, order):
+        base, quote = split_symbol(order["symbol"])
+        quantity = float(order["origQty"])
+        cost = quantity * float(order["price"])
+        if order["side"] == "BUY":
+            self.balances[quote]["locked"] -= cost
+            self.balances[base]["free"] += quantity
+        else:
+            self.balances[base]["locked"] -= quantity
+            self.balances[quote]["free"] += cost
+        order["status"] = "FILLED"
+        order["executedQty"] = order["origQty"]
+        order["updateTime"] = int(time.time() * 1000)
+        self.trades.append({"symbol": order["symbol"], "id": len(self.trades) + 1, "orderId": order["orderId"],
+                            "price": order["price"], "qty": order["origQty"], "isBuyer": order["side"] == "BUY",
+                            "time": order["updateTime"]})
+
+    def weigh(self, method, path, params):
+        """Counts request weight in the current minute, returns the total used"""
+        minute = int(time.time() // 60)
+        used = self.used_weight.get(minute, 0) + rate_limit.weight(method, path, params)
+        self.used_weight = {minute: used}
+        return used
+
+    def handle(self, method, path, params):
+        """Serves one request.
+
+        Returns:
+            tuple: (status code, response body, extra headers)
+
+        """
+        time.sleep(self.latency + self.random.uniform(0, self.jitter))
+
+        with self.lock:
+            headers = {"X-MBX-USED-WEIGHT-1M": str(self.weigh(method, path, params))}
+            roll = self.random.random()
+            if roll < self.rate_limited_rate:
+                return 429, {"code": -1003, "msg": "Too many requests."}, dict(headers, **{"Retry-After": "1"})
+            if roll < self.rate_limited_rate + self.error_rate:
+                return 500, {"code": -1000, "msg": "An unknown error occured while processing the request."}, headers
+
+            if self.tick_seconds:
+                self.match()
+
+            route = (method, path)
+            if route not in ROUTES:
+                return 404, {"code": -1100, "msg": "Unknown endpoint {0} {1}".format(method, path)}, headers
+            status, body = ROUTES[route](self, params)
+            return status, body, headers
+
+    def ping(self, params):
+        return 200, {}
+
+    def server_time(self, params):
+        return 200, {"serverTime": int(time.time() * 1000)}
+
+    def exchange_info(self, params):
+        step = "{0:.8f}".format(self.step_size)
+        tick = "{0:.8f}".format(self.tick_size)
+        return 200, {"timezone": "UTC", "serverTime": int(time.time() * 1000), "symbols": [{
+            "symbol": symbol,
+            "status": "TRADING",
+            "baseAsset": split_symbol(symbol)[0],
+            "quoteAsset": split_symbol(symbol)[1],
+            "filters": [
+                {"filterType": "PRICE_FILTER", "minPrice": tick, "maxPrice": "100000.00000000", "tickSize": tick},
+                {"filterType": "LOT_SIZE", "minQty": step, "maxQty": "90000000.00000000", "stepSize": step},
+                {"filterType": "MIN_NOTIONAL", "minNotional": "{0:.8f}".format(self.min_notional)},
+            ]} for symbol in self.symbols]}
+
+    def ticker_price(self, params):
+        return 200, [{"symbol": symbol, "price": "{0:.8f}".format(self.price(symbol))} for symbol in self.symbols]
+
+    def book_tickers(self, params):
+        return 200, [{"symbol": symbol,
+                      "bidPrice": "{0:.8f}".format(self.price(symbol) * (1 - self.spread / 2)),
+                      "bidQty": "100.00000000",
+                      "askPrice": "{0:.8f}".format(self.price(symbol) * (1 + self.spread / 2)),
+                      "askQty": "100.00000000"} for symbol in self.symbols]
+
+    def depth(self, params):
+        if params.get("symbol") not in self.columns:
+            return 400, {"code": -1121, "msg": "Invalid symbol."}
+        price = self.price(params["symbol"])
+        levels = int(params.get("limit", 100))
+        return 200, {"lastUpdateId": self.current_row(),
+                     "bids": [["{0:.8f}".format(price * (1 - self.spread / 2) * (1 - 0.0005 * level)),
+                               "{0:.8f}".format(10.0 * (level + 1)), []] for level in range(levels)],
+                     "asks": [["{0:.8f}".format(price * (1 + self.spread / 2) * (1 + 0.0005 * level)),
+                               "{0:.8f}".format(10.0 * (level + 1)), []] for level in range(levels)]}
+
+    def klines(self, params):
+        if params.get("symbol") not in self.columns:
+            return 400, {"code": -1121, "msg": "Invalid symbol."}
+        column = self.columns[params["symbol"]]
+        close_times = self.history.index.to_numpy()
+        interval_ms = int(close_times[1] - close_times[0]) if len(close_times) > 1 else 60 * 1000
+
+        # Only candles the replay has reached have closed
+        rows = np.arange(self.current_row() + 1)
+        if "startTime" in params:
+            rows = rows[close_times[rows] - interval_ms + 1 >= int(params["startTime"])]
+        if "endTime" in params:
+            rows = rows[close_times[rows] - interval_ms + 1 <= int(params["endTime"])]
+        limit = min(int(params.get("limit", 500)), 1000)
+        rows = rows[:limit] if "startTime" in params else rows[-limit:]
+
+        closes = self.closes[:, column]
+        return 200, [[int(close_times[row] - interval_ms + 1),
+                      "{0:.8f}".format(closes[row - 1] if row else closes[row]),
+                      "{0:.8f}".format(max(closes[row], closes[row - 1] if row else closes[row])),
+                      "{0:.8f}".format(min(closes[row], closes[row - 1] if row else closes[row])),
+                      "{0:.8f}".format(closes[row]),
+                      "1000.00000000",
+                      int(close_times[row]),
+                      "{0:.8f}".format(1000 * closes[row]),
+                      100, "500.00000000", "{0:.8f}".format(500 * closes[row]), "0"] for row in rows]
+
+    def account(self, params):
+        return 200, {"makerCommission": 10, "takerCommission": 10, "canTrade": True,
+                     "balances": [{"asset": asset, "free": "{0:.8f}".format(balance["free"]),
+                                   "locked": "{0:.8f}".format(balance["locked"])}
+                                  for asset, balance in sorted(self.balances.items())]}
+
+    def new_order(self, params, test=False):
+        symbol = params.get("symbol")
+        if symbol not in self.columns:
+            return 400, {"code": -1121, "msg": "Invalid symbol."}
+        for name in ("quantity", "price"):
+            if not NUMBER.match(params.get(name, "")):
+                return 400, {"code": -1100, "msg": "Illegal characters found in parameter '{0}'; legal range is "
+                                                   "'{1}'.".format(name, NUMBER.pattern)}
+        quantity = float(params["quantity"])
+        price = float(params["price"])
+        if quantity < self.step_size or Decimal(params["quantity"]) % Decimal("{0:.8f}".format(self.step_size)):
+            return 400, {"code": -1013, "msg": "Filter failure: LOT_SIZE"}
+        if price <= 0 or Decimal(params["price"]) % Decimal("{0:.8f}".format(self.tick_size)):
+            return 400, {"code": -1013, "msg": "Filter failure: PRICE_FILTER"}
+        if quantity * price < self.min_notional:
+            return 400, {"code": -1013, "msg": "Filter failure: MIN_NOTIONAL"}
+
+        base, quote = split_symbol(symbol)
+        asset, amount = (quote, quantity * price) if params["side"] == "BUY" else (base, quantity)
+        if self.balances[asset]["free"] < amount:
+            return 400, {"code": -2010, "msg": "Account has insufficient balance for requested action."}
+        if test:
+            return 200, {}
+
+        self.balances[asset]["free"] -= amount
+        self.balances[asset]["locked"] += amount
+        now = int(time.time() * 1000)
+        order = {"symbol": symbol, "orderId": next(self.order_ids),
+                 "clientOrderId": params.get("newClientOrderId", "mock{0}".format(now)),
+                 "price": params["price"], "origQty": params["quantity"], "executedQty": "0.00000000",
+                 "status": "NEW", "timeInForce": params.get("timeInForce", "GTC"), "type": params.get("type", "LIMIT"),
+                 "side": params["side"], "time": now, "updateTime": now, "transactTime": now}
+        self.orders[order["orderId"]] = order
+        self.match()
+        return 200, dict(order)
+
+    def test_order(self, params):
+        return self.new_order(params, test=True)
+
+    def find_order(self, params):
+        order = self.orders.get(int(params.get("orderId", 0)))
+        if order is None or order["symbol"] != params.get("symbol"):
+            return None
+        return order
+
+    def order_status(self, params):
+        order = self.find_order(params)
+        if order is None:
+            return 400, {"code": -2013, "msg": "Order does not exist."}
+        return 200, dict(order)
+
+    def cancel(self, params):
+        order = self.find_order(params)
+        if order is None or order["status"] != "NEW":
+            return 400, {"code": -2011, "msg": "Unknown order sent."}
+        base, quote = split_symbol(order["symbol"])
+        asset, amount = (quote, float(order["origQty"]) * float(order["price"])) if order["side"] == "BUY" \
+            else (base, float(order["origQty"]))
+        self.balances[asset]["locked"] -= amount
+        self.balances[asset]["free"] += amount
+        order["status"] = "CANCELED"
+        order["updateTime"] = int(time.time() * 1000)
+        return 200, dict(order)
+
+    def open_orders(self, params):
+        return 200, [dict(order) for order in self.orders.values() if order["status"] == "NEW"
+                     and params.get("symbol", order["symbol"]) == order["symbol"]]
+
+    def all_orders(self, params):
+        return 200, [dict(order) for order in self.orders.values() if order["symbol"] == params.get("symbol")]
+
+    def my_trades(self, params):
+        return 200, [trade for trade in self.trades if trade["symbol"] == params.get("symbol")]
+
+
+ROUTES = {
+    ("GET", "/api/v1/ping"): MockExchange.ping,
+    ("GET", "/api/v1/time"): MockExchange.server_time,
+    ("GET", "/api/v1/exchangeInfo"): MockExchange.exchange_info,
+    ("GET", "/api/v3/ticker/price"): MockExchange.ticker_price,
+    ("GET", "/api/v1/ticker/allBookTickers"): MockExchange.book_tickers,
+    ("GET", "/api/v1/depth"): MockExchange.depth,
+    ("GET", "/api/v1/klines"): MockExchange.klines,
+    ("GET", "/api/v3/account"): MockExchange.account,
+    ("POST", "/api/v3/order"): MockExchange.new_order,
+    ("POST", "/api/v3/order/test"): MockExchange.test_order,
+    ("GET", "/api/v3/order"): MockExchange.order_status,
+    ("DELETE", "/api/v3/order"): MockExchange.cancel,
+    ("GET", "/api/v3/openOrders"): MockExchange.open_orders,
+    ("GET", "/api/v3/allOrders"): MockExchange.all_orders,
+    ("GET", "/api/v3/myTrades"): MockExchange.my_trades,
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, without this keep-alive responses stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def respond(self, method):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        if self.headers.get("Content-Length"):
+            params.update(parse_qsl(self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")))
+
+        status, body, headers = self.server.exchange.handle(method, url.path, params)
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self.respond("GET")
+
+    def do_POST(self):
+        self.respond("POST")
+
+    def do_DELETE(self):
+        self.respond("DELETE")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(exchange, host="127.0.0.1", port=0):
+    """Serves an exchange from a background thread.
+
+    Returns:
+        ThreadingHTTPServer: call shutdown() to stop, the endpoint is "http://{host}:{server_port}"
+
+    """
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.exchange = exchange
+    threading.Thread(target=server.serve_forever, name="mock_exchange", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock Binance exchange for offline load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--portfolio", default="./rebalancer/portfolio.csv",
+                        help="portfolio.csv whose symbols are served")
+    parser.add_argument("--history", help="csv of close prices indexed by closeTime, synthetic if not given")
+    parser.add_argument("--ticks", type=int, default=10000, help="synthetic candles per symbol")
+    parser.add_argument("--start-row", type=int, default=1000, help="candles served as history before the replay")
+    parser.add_argument("--tick-seconds", type=float, default=1.0, help="wall time per replayed candle")
+    parser.add_argument("--btc", type=float, default=1.0, help="starting BTC balance")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limited-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    if args.history:
+        history = pd.read_csv(args.history, index_col=0)
+    else:
+        symbols = list(pd.read_csv(args.portfolio, index_col=1).index)
+        # The replay starts now, so the served history ends at the current time
+        end = int(time.time() * 1000) + (args.ticks - 1 - args.start_row) * 60 * 1000
+        history = synthetic_history(symbols, ticks=args.ticks, seed=args.seed, end=end)
+
+    exchange = MockExchange(history, balances={"BTC": args.btc}, start_row=args.start_row,
+                            tick_seconds=args.tick_seconds,
+                            latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                            rate_limited_rate=args.rate_limited_rate, seed=args.seed)
+    server = serve(exchange, args.host, args.port)
+    print("Mock exchange serving {0} symbols on http://{1}:{2}".format(len(exchange.symbols), args.host,
+                                                                      server.server_port))
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import logging
+import os
+import threading
+import time
+import rebalancer.async_api as async_api
+import rebalancer.binance_api as api
+import rebalancer.metrics as metrics
+import rebalancer.reporting as reporting
+from rebalancer.exchange_info import ExchangeInfo
+from rebalancer.testers import LiveTester
+
+
+logger = logging.getLogger(__name__)
+
+# Settings that belong to the process rather than to one account
+SHARED_KEYS = ("endpoint", "http_pool_size", "http_timeout", "http_max_retries", "weight_limit", "order_limit",
+               "max_concurrency", "exchange_info_cache", "exchange_info_ttl", "metrics_file", "metrics_port",
+               "metrics_interval", "telegram_queue_size", "telegram_retries", "accounts")
+
+
+class MarketData(object):
+    """
+    prices() and tickers() snapshots shared by every account. A snapshot is refetched once older than ttl seconds,
+    and accounts asking while it is being fetched wait for that one request instead of sending their own.
+    """
+    def __init__(self, ttl=1.0):
+        self.ttl = ttl
+        self.snapshots = {}
+        self.locks = {"prices": threading.Lock(), "tickers": threading.Lock()}
+
+    def get(self, name, function):
+        with self.locks[name]:
+            fetched, snapshot = self.snapshots.get(name, (0.0, None))
+            if snapshot is None or time.time() - fetched > self.ttl:
+                snapshot = function()
+                self.snapshots[name] = (time.time(), snapshot)
+                metrics.inc("market_data_fetches_total", snapshot=name)
+            return snapshot
+
+    def prices(self):
+        return self.get("prices", api.prices)
+
+    def tickers(self):
+        return self.get("tickers", api.tickers)
+
+
+class Orchestrator(object):
+    """
+    Runs the LiveTester of several accounts in one process.
+
+    The exchange info index, price snapshots, HTTP session and async worker pool are shared, while every account
+    signs with its own keys under its own rate limit budget. Each account runs its own scheduler on its own thread,
+    so a slow account never holds up the rebalances of the others.
+    """
+    def __init__(self, config):
+        """
+        Args:
+            config (dict): configuration dictionary from config.yaml, with an accounts list. Every account has a
+                name, the environment variables of its keys in api_key_env and secret_key_env, and overrides any
+                other setting of config, e.g. its own portfolio csv.
+        """
+        self.config = config
+        self.accounts = config.get("accounts") or []
+        if not self.accounts:
+            raise ValueError("No accounts configured")
+        names = [account["name"] for account in self.accounts]
+        if len(set(names)) != len(names):
+            raise ValueError("Account names must be unique")
+
+        api.configure(pool_size=config.get("http_pool_size"), timeout=config.get("http_timeout"),
+                      max_retries=config.get("http_max_retries"), weight_limit=config.get("weight_limit"),
+                      order_limit=config.get("order_limit"), endpoint=config.get("endpoint"))
+        async_api.configure(max_concurrency=config.get("max_concurrency"))
+
+        self.exchange_info = ExchangeInfo(config.get("exchange_info_cache") or "./rebalancer/exchange_info.json",
+                                          ttl=config.get("exchange_info_ttl") or 24 * 60 * 60)
+        self.market_data = MarketData(ttl=config.get("market_data_ttl") or 1.0)
+
+        self.metrics_exporter = None
+        self.metrics_server = None
+        if config.get("metrics_file"):
+            self.metrics_exporter = metrics.FileExporter(config["metrics_file"],
+                                                         interval=config.get("metrics_interval") or 60).start()
+        if config.get("metrics_port"):
+            self.metrics_server = metrics.serve(config["metrics_port"])
+
+        self.client = None
+        self.reporter = None
+        self.testers = {}
+        self.errors = {}
+        self.threads = []
+
+    def account_config(self, account):
+        """The settings of one account, its journal and recording files default to names of their own"""
+        config = {key: value for key, value in self.config.items() if key not in SHARED_KEYS}
+        config.update(account)
+        # Blank settings load as None, and accounts sharing one journal would compact away each other's orders
+        for key, default in (("journal_path", "./rebalancer/{0}.open_orders.journal"),
+                             ("open_orders_path", "./rebalancer/{0}.open_orders.csv")):
+            if not account.get(key):
+                config[key] = default.format(account["name"])
+        if config.get("record_path") and not account.get("record_path"):
+            config["record_path"] = "./rebalancer/{0}.record".format(account["name"])
+        return config
+
+    def credentials(self, account):
+        key = os.environ.get(account.get("api_key_env") or "API_KEY")
+        secret = os.environ.get(account.get("secret_key_env") or "SECRET_KEY")
+        if None in [key, secret]:
+            raise ValueError("Check environment variables of account {0}".format(account["name"]))
+        return api.Account(account["name"], key, secret, weight_limit=account.get("weight_limit"),
+                           order_limit=account.get("order_limit"))
+
+    def run_account(self, account):
+        """Thread target, builds the tester of one account then runs its scheduler with the account's keys"""
+        try:
+            with api.use(self.credentials(account)) as credentials:
+                tester = LiveTester(self.account_config(account), exchange_info=self.exchange_info,
+                                    market_data=self.market_data, account=credentials)
+                tester.client = self.client
+                tester.reporter = self.reporter
+                self.testers[account["name"]] = tester
+                logger.info("Account %s started.", account["name"])
+                tester.start()
+        except Exception as error:
+            self.errors[account["name"]] = error
+            logger.exception("Account %s stopped: %s", account["name"], error)
+
+    def start(self, wait=True):
+        """Starts every account on its own thread, waiting for all of them to stop unless wait is False"""
+        if self.client and self.reporter is None:
+            # One worker sends the reports of every account, the Telegram client is not safe to share across threads
+            self.reporter = reporting.Reporter(self.client.send_message,
+                                               max_pending=self.config.get("telegram_queue_size") or 100,
+                                               max_retries=self.config.get("telegram_retries") or 3).start()
+        for account in self.accounts:
+            thread = threading.Thread(target=self.run_account, args=(account,), name=account["name"], daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        if wait:
+            for thread in self.threads:
+                thread.join()
@@ -0,0 +1,75 @@
+import heapq
+
+
+FIELDS = ["orderId", "origQty", "price", "side", "symbol", "time"]
+
+
+class OpenOrders(object):
+    """
+    Open orders indexed by orderId, with a min-heap on placement time so expiry checks only look at orders that are
+    due. Orders removed from the index are dropped from the heap lazily, when they reach its top.
+    """
+    def __init__(self, orders=()):
+        self.orders = {}
+        self.heap = []
+        for order in orders:
+            self.add(order)
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __contains__(self, order_id):
+        return order_id in self.orders
+
+    def __iter__(self):
+        """Orders oldest first, as rows of FIELDS"""
+        return iter(sorted(self.orders.values(), key=lambda order: order["time"]))
+
+    def get(self, order_id):
+        return self.orders.get(order_id)
+
+    def add(self, order):
+        """Tracks an order given in the format of binance_api.openOrders(), keeping only FIELDS"""
+        order = {field: order[field] for field in FIELDS}
+        if order["orderId"] not in self.orders:
+            heapq.heappush(self.heap, (order["time"], order["orderId"]))
+        self.orders[order["orderId"]] = order
+
+    def remove(self, order_id):
+        """Stops tracking an order, returns it or None if it was not tracked"""
+        return self.orders.pop(order_id, None)
+
+    def sync(self, snapshot):
+        """Makes the tracked orders match a snapshot of the open orders on the exchange.
+
+        Args:
+            snapshot (list): open orders, see binance_api.openOrders()
+
+        Returns:
+            tuple: lists of the orders that were added and of those that left the book (filled or cancelled)
+
+        """
+        open_ids = {order["orderId"] for order in snapshot}
+        closed = [self.orders.pop(order_id) for order_id in list(self.orders) if order_id not in open_ids]
+        added = [order for order in snapshot if order["orderId"] not in self.orders]
+        for order in snapshot:
+            self.add(order)
+        if len(self.heap) > 2 * len(self.orders) + 16:
+            self.heap = [(order["time"], order["orderId"]) for order in self.orders.values()]
+            heapq.heapify(self.heap)
+        return added, closed
+
+    def due(self, before):
+        """Removes and returns every order placed at or before a time, oldest first.
+
+        Args:
+            before (float): milliseconds
+
+        """
+        expired = []
+        while self.heap and self.heap[0][0] <= before:
+            _, order_id = heapq.heappop(self.heap)
+            order = self.orders.pop(order_id, None)
+            if order is not None:
+                expired.append(order)
+        return expired
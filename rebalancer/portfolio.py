@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+
+
+class Portfolio(object):
+    """
+    Balances, prices and derived values of a portfolio in arrays, one slot per symbol in a fixed order.
+
+    Bulk setters revalue every coin at once. A single price or balance change only updates that coin's value and
+    the totals, except a BTCUSDT price which revalues every coin since all others are quoted in BTC.
+
+    With a conversion.Converter coins are valued through its market paths instead, so symbols may have any quote
+    asset, and a price only revalues the coins whose path crosses its symbol.
+    """
+    __slots__ = ("symbols", "index", "base_index", "converter", "targets", "balances", "hodl_balances", "prices",
+                 "market", "prices_usd", "btc_usd", "values", "hodl_values", "total", "hodl_total")
+
+    def __init__(self, symbols, targets, base="BTCUSDT", converter=None):
+        """
+        Args:
+            symbols (list)
+            targets (list): target weights, in symbols order
+            base (str, optional): USD quoted symbol the others are valued through, without a converter
+            converter (conversion.Converter, optional): values the coin of each symbol, in symbols order, followed by
+                BTC for min_btc_order
+        """
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.converter = converter
+        if converter is None:
+            self.base_index = self.index[base]
+        elif len(converter.assets) != len(self.symbols) + 1:
+            raise ValueError("The converter must value the coin of every symbol followed by BTC")
+        else:
+            self.base_index = None
+        self.market = None
+        self.btc_usd = 0.0
+        self.targets = np.asarray(targets, dtype=np.float64)
+        self.balances = np.zeros(len(self.symbols))
+        self.hodl_balances = np.zeros(len(self.symbols))
+        self.prices = np.zeros(len(self.symbols))
+        self.prices_usd = np.zeros(len(self.symbols))
+        self.values = np.zeros(len(self.symbols))
+        self.hodl_values = np.zeros(len(self.symbols))
+        self.total = 0.0
+        self.hodl_total = 0.0
+
+    def array(self, values):
+        """Values of a dict or series keyed by symbol, or a sequence already in symbols order, as floats"""
+        if hasattr(values, "keys"):
+            return np.array([float(values[symbol]) for symbol in self.symbols])
+        return np.array(values, dtype=np.float64)
+
+    def set_prices(self, prices):
+        """
+        Args:
+            prices (dict, pd.Series or list): last prices, BTC quoted except the base symbol, or with a converter
+                a prices() snapshot that also holds the symbols of its paths
+        """
+        self.prices = self.array(prices)
+        if self.converter is not None:
+            self.market = self.converter.vector(prices)
+        self.revalue()
+
+    def set_balances(self, balances, hodl_balances=None):
+        self.balances = self.array(balances)
+        if hodl_balances is not None:
+            self.hodl_balances = self.array(hodl_balances)
+        self.revalue()
+
+    def revalue(self):
+        if self.converter is not None:
+            rates = self.converter.rates(self.market) if self.market is not None else np.zeros(len(self.symbols) + 1)
+            self.prices_usd = rates[:-1]
+            self.btc_usd = rates[-1]
+        else:
+            self.prices_usd = self.prices * self.prices[self.base_index]
+            self.prices_usd[self.base_index] = self.prices[self.base_index]
+            self.btc_usd = self.prices_usd[self.base_index]
+        self.values = self.balances * self.prices_usd
+        self.hodl_values = self.hodl_balances * self.prices_usd
+        self.total = float(self.values.sum())
+        self.hodl_total = float(self.hodl_values.sum())
+
+    def set_price(self, symbol, price):
+        """Applies one new last price, symbols outside the portfolio are ignored"""
+        i = self.index.get(symbol)
+        if self.converter is not None:
+            self.set_market_price(i, symbol, price)
+            return
+        if i is None:
+            return
+        self.prices[i] = price
+        if i == self.base_index:
+            self.revalue()
+            return
+        self.prices_usd[i] = price * self.prices[self.base_index]
+        self.update_value(i)
+
+    def set_market_price(self, i, symbol, price):
+        if i is not None:
+            self.prices[i] = price
+        j = self.converter.column.get(symbol)
+        if j is None:
+            return
+        self.market[j] = price
+        rows = self.converter.dependents[symbol]
+        for row, rate in zip(rows.tolist(), self.converter.rates(self.market, rows).tolist()):
+            if row == len(self.symbols):
+                self.btc_usd = rate
+            else:
+                self.prices_usd[row] = rate
+                self.update_value(row)
+
+    def set_balance(self, symbol, balance):
+        i = self.index[symbol]
+        self.balances[i] = balance
+        self.update_value(i)
+
+    def update_value(self, i):
+        value = self.balances[i] * self.prices_usd[i]
+        hodl_value = self.hodl_balances[i] * self.prices_usd[i]
+        self.total += value - self.values[i]
+        self.hodl_total += hodl_value - self.hodl_values[i]
+        self.values[i] = value
+        self.hodl_values[i] = hodl_value
+
+    def weights(self):
+        if self.total <= 0:
+            return np.zeros(len(self.symbols))
+        return self.values / self.total
+
+    def weight(self, symbol):
+        return self.values[self.index[symbol]] / self.total if self.total > 0 else 0.0
+
+    def diffs(self):
+        """Target minus current weight of each coin"""
+        return self.targets - self.weights()
+
+    def purchase_volumes(self):
+        """Quantity of each coin to buy, negative to sell, that takes it back to its target"""
+        return self.diffs() * self.total / self.prices_usd
+
+    def trade_volumes(self):
+        """USD value of purchase_volumes()"""
+        return self.purchase_volumes() * self.prices_usd
+
+    def sides(self, min_btc_order):
+        """True to buy, False to sell, None for trades smaller than min_btc_order BTC"""
+        minimum = min_btc_order * self.btc_usd
+        return [True if volume >= minimum else False if volume <= -minimum else None
+                for volume in self.trade_volumes().tolist()]
+
+    def columns(self, min_btc_order):
+        """Every value of the portfolio as the Tester.data columns they are read from"""
+        columns = {
+            "portfolio_balances": self.balances,
+            "portfolio_prices": self.prices,
+            "portfolio_prices_usd": self.prices_usd,
+            "total_usd": self.values,
+            "total_usd_hodl": self.hodl_values,
+            "percentages": self.weights(),
+            "percentage_diffs": self.diffs(),
+            "purchase_volumes": self.purchase_volumes(),
+            "trade_volumes": self.trade_volumes(),
+        }
+        columns = {name: pd.Series(values.copy(), index=self.symbols) for name, values in columns.items()}
+        columns["if_buy"] = pd.Series(self.sides(min_btc_order), index=self.symbols, dtype=object)
+        return columns
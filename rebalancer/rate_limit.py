@@ -0,0 +1,163 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+
+# Request weight of each endpoint, see weight() for endpoints whose weight depends on their parameters
+WEIGHTS = {
+    "/api/v1/ping": 1,
+    "/api/v1/time": 1,
+    "/api/v1/exchangeInfo": 10,
+    "/api/v3/ticker/price": 2,
+    "/api/v1/ticker/allBookTickers": 2,
+    "/api/v1/klines": 1,
+    "/api/v3/account": 10,
+    "/api/v3/order": 1,
+    "/api/v3/order/test": 1,
+    "/api/v3/allOrders": 10,
+    "/api/v3/myTrades": 10,
+}
+
+# Lower goes first, orders and cancels are never held behind informational reads
+ORDER = 0
+ACCOUNT = 1
+MARKET = 2
+
+
+def weight(method, path, params=None):
+    """Request weight Binance counts against the per minute limit for a call.
+
+    Args:
+        method (str)
+        path (str)
+        params (dict, optional)
+
+    """
+    params = params or {}
+    if path == "/api/v1/depth":
+        limit = int(params.get("limit", 100))
+        return 1 if limit <= 100 else 5 if limit <= 500 else 10
+    if path == "/api/v3/openOrders":
+        return 3 if "symbol" in params else 40
+    if path == "/api/v3/order" and method == "GET":
+        return 2
+    return WEIGHTS.get(path, 1)
+
+
+def priority(method, path):
+    """Queue priority of a call, see ORDER, ACCOUNT and MARKET."""
+    if path.startswith("/api/v3/order") and method in ("POST", "DELETE"):
+        return ORDER
+    if path.startswith("/api/v3/"):
+        return ACCOUNT
+    return MARKET
+
+
+def is_order(method, path):
+    """Whether a call counts against the order rate limit."""
+    return method == "POST" and path == "/api/v3/order"
+
+
+def backoff(attempt, base=0.5, cap=30):
+    """Seconds to wait before a retry, exponential in attempt with jitter so clients don't retry in lockstep."""
+    return min(cap, base * 2 ** attempt) * random.uniform(0.5, 1)
+
+
+class TokenBucket(object):
+    """Tokens refill continuously at capacity / period per second up to capacity."""
+    def __init__(self, capacity, period, clock=time.monotonic):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until amount tokens are available"""
+        self.refill()
+        return max(0.0, (min(amount, self.capacity) - self.tokens) / self.rate)
+
+    def take(self, amount):
+        self.refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def used(self, amount):
+        """Lowers the tokens to what the exchange reports is left of the window"""
+        self.refill()
+        self.tokens = min(self.tokens, self.capacity - amount)
+
+
+class RateLimiter(object):
+    """
+    Client side limiter for Binance's request weight and order count limits. Calls wait in a priority queue for
+    tokens, so throughput stays at the most the exchange allows while orders and cancels go ahead of reads. The
+    buckets are corrected from the used weight/order count headers of every response, and a 429 or 418 response
+    holds every call until its Retry-After has passed.
+    """
+    def __init__(self, weight_limit=1200, order_limit=50, clock=time.monotonic):
+        """
+        Args:
+            weight_limit (int, optional): request weight per minute
+            order_limit (int, optional): orders per 10 seconds
+        """
+        self.clock = clock
+        self.weights = TokenBucket(weight_limit, 60, clock)
+        self.orders = TokenBucket(order_limit, 10, clock)
+        self.banned_until = 0
+
+        self.condition = threading.Condition()
+        self.waiting = []
+        self.counter = itertools.count()
+
+    def acquire(self, weight, priority=MARKET, order=False):
+        """Blocks until the call at the head of the queue, by priority then arrival, can be sent.
+
+        Args:
+            weight (int): request weight of the call
+            priority (int, optional): ORDER, ACCOUNT or MARKET
+            order (bool, optional): the call places an order
+
+        """
+        with self.condition:
+            ticket = (priority, next(self.counter))
+            heapq.heappush(self.waiting, ticket)
+            try:
+                while True:
+                    if self.waiting[0] != ticket:
+                        self.condition.wait()
+                        continue
+                    wait = max(self.banned_until - self.clock(), self.weights.wait_time(weight),
+                               self.orders.wait_time(1) if order else 0)
+                    if wait <= 0:
+                        self.weights.take(weight)
+                        if order:
+                            self.orders.take(1)
+                        return
+                    self.condition.wait(wait)
+            finally:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                self.condition.notify_all()
+
+    def update(self, headers):
+        """Syncs the buckets with the rate limit headers of a response"""
+        with self.condition:
+            used_weight = headers.get("X-MBX-USED-WEIGHT-1M", headers.get("X-MBX-USED-WEIGHT"))
+            if used_weight is not None:
+                self.weights.used(int(used_weight))
+            order_count = headers.get("X-MBX-ORDER-COUNT-10S")
+            if order_count is not None:
+                self.orders.used(int(order_count))
+
+    def ban(self, retry_after):
+        """Holds every call for retry_after seconds, after a 429 (rate limited) or 418 (IP banned) response"""
+        with self.condition:
+            self.banned_until = max(self.banned_until, self.clock() + float(retry_after))
+            self.condition.notify_all()
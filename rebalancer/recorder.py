@@ -0,0 +1,171 @@
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+import numpy as np
+import pandas as pd
+
+
+PRICES = "prices"
+TICKERS = "tickers"
+BALANCES = "balances"
+ORDER = "order"
+REBALANCE = "rebalance"
+
+# Chunk header: magic, compressed payload length, number of records, time of the first record in milliseconds
+HEADER = struct.Struct("<4sIIq")
+MAGIC = b"RBC1"
+
+
+class Recorder(object):
+    """
+    Appends timestamped snapshots and events to a log of zlib compressed chunks.
+
+    record() only queues the record, a background thread batches records into chunks of chunk_records, or whatever
+    arrived within chunk_seconds, then serialises, compresses and appends each chunk with a small header. A chunk cut
+    short by a crash is skipped when the log is read.
+    """
+    def __init__(self, path, chunk_records=256, chunk_seconds=5.0, level=6):
+        """
+        Args:
+            path (str): log file, appended to if it exists
+            chunk_records (int, optional): records per chunk at most
+            chunk_seconds (float, optional): seconds a record may wait before its chunk is written
+            level (int, optional): zlib compression level
+        """
+        self.path = path
+        self.chunk_records = chunk_records
+        self.chunk_seconds = chunk_seconds
+        self.level = level
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="recorder", daemon=True)
+        self.closed = False
+
+    def start(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.thread.start()
+        return self
+
+    def record(self, kind, data, at=None):
+        """Queues a record, data must be JSON serialisable and is not copied so must not change afterwards.
+
+        Args:
+            kind (str): e.g. PRICES, TICKERS, BALANCES, ORDER or REBALANCE
+            data: snapshot or event
+            at (int, optional): milliseconds, defaults to now
+
+        """
+        self.queue.put((int(at if at is not None else time.time() * 1000), kind, data))
+
+    def close(self):
+        """Writes every queued record, then stops the writer"""
+        if not self.closed:
+            self.closed = True
+            self.queue.put(None)
+            self.thread.join()
+
+    def run(self):
+        with open(self.path, "ab") as file:
+            while True:
+                first = self.queue.get()
+                if first is None:
+                    return
+                chunk = [first]
+                deadline = time.monotonic() + self.chunk_seconds
+                stopping = False
+                while len(chunk) < self.chunk_records:
+                    try:
+                        entry = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if entry is None:
+                        stopping = True
+                        break
+                    chunk.append(entry)
+                self.write(file, chunk)
+                if stopping:
+                    return
+
+    def write(self, file, chunk):
+        payload = zlib.compress(json.dumps(chunk, separators=(",", ":")).encode(), self.level)
+        file.write(HEADER.pack(MAGIC, len(payload), len(chunk), chunk[0][0]) + payload)
+        file.flush()
+
+
+class LogReader(object):
+    """Reads a Recorder log through a memory map, decompressing one chunk at a time."""
+    def __init__(self, path):
+        self.path = path
+
+    def chunks(self):
+        """Offsets, lengths, record counts and first times of the complete chunks of the log"""
+        chunks = []
+        if not os.path.exists(self.path) or not os.path.getsize(self.path):
+            return chunks
+        with open(self.path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            offset = 0
+            while offset + HEADER.size <= len(view):
+                magic, length, count, first = HEADER.unpack_from(view, offset)
+                if magic != MAGIC or offset + HEADER.size + length > len(view):
+                    break
+                chunks.append((offset + HEADER.size, length, count, first))
+                offset += HEADER.size + length
+        return chunks
+
+    def records(self, kinds=None, start=None):
+        """Yields (at, kind, data) of every record in order.
+
+        Args:
+            kinds (set, optional): only records of these kinds
+            start (int, optional): skips chunks that only hold records before these milliseconds
+
+        """
+        chunks = self.chunks()
+        if not chunks:
+            return
+        with open(self.path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            for i, (offset, length, count, first) in enumerate(chunks):
+                if start is not None and i + 1 < len(chunks) and chunks[i + 1][3] < start:
+                    continue
+                try:
+                    entries = json.loads(zlib.decompress(view[offset:offset + length]))
+                except (zlib.error, ValueError):
+                    continue
+                for at, kind, data in entries:
+                    if (kinds is None or kind in kinds) and (start is None or at >= start):
+                        yield at, kind, data
+
+
+class Replay(object):
+    """
+    What a LiveTester recorded, laid out for BackTester: the portfolio prices of every recorded prices snapshot and
+    the first recorded balances.
+    """
+    def __init__(self, path, symbols, coins):
+        """
+        Args:
+            path (str): Recorder log
+            symbols (list): portfolio symbols, columns of closes
+            coins (list): coin of each symbol, to read balances
+        """
+        times, rows = [], []
+        self.balances = None
+        for at, kind, data in LogReader(path).records(kinds={PRICES, BALANCES}):
+            if kind == PRICES:
+                times.append(at)
+                rows.append([float(data[symbol]) if symbol in data else np.nan for symbol in symbols])
+            elif self.balances is None:
+                self.balances = pd.Series({symbol: float(data[coin]["free"]) if coin in data else 0.0
+                                           for symbol, coin in zip(symbols, coins)})
+
+        closes = pd.DataFrame(rows, index=pd.Index(times, dtype=np.int64), columns=symbols, dtype=np.float64)
+        # Snapshots from before every symbol was listed are dropped, gaps after that carry the last price forward
+        self.closes = closes.ffill().dropna()
+        if self.closes.empty:
+            raise ValueError("No prices of every portfolio symbol recorded in {0}".format(path))
@@ -0,0 +1,159 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+def minmax(x, y, points):
+    """Indices of a series downsampled to about points, keeping the lowest and highest value of every bucket.
+
+    Args:
+        x (array): increasing
+        y (array)
+        points (int): points wanted, at least 4
+
+    Returns:
+        array: sorted indices into x and y, first and last included
+
+    """
+    n = len(y)
+    if n <= points:
+        return np.arange(n)
+    buckets = max(1, (points - 2) // 2)
+    size = -(-(n - 2) // buckets)
+    # Inner points in equal buckets, the last one padded so each bucket's extremes are found in one pass
+    rows = -(-(n - 2) // size)
+    middle = np.full(rows * size, np.nan)
+    middle[:n - 2] = y[1:n - 1]
+    middle = middle.reshape(rows, size)
+    offsets = 1 + np.arange(len(middle)) * size
+    return np.unique(np.concatenate([[0, n - 1], offsets + np.nanargmin(middle, axis=1),
+                                     offsets + np.nanargmax(middle, axis=1)]))
+
+
+def lttb(x, y, points):
+    """Indices of a series downsampled to points with Largest-Triangle-Three-Buckets, which keeps its visual shape.
+
+    Args:
+        x (array): increasing
+        y (array)
+        points (int): points wanted, at least 3
+
+    Returns:
+        array: sorted indices into x and y, first and last included
+
+    """
+    n = len(y)
+    if n <= points or points < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    indices = np.empty(points, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        following = slice(edges[bucket + 1], edges[bucket + 2] if bucket + 2 < len(edges) else n)
+        a = indices[bucket]
+        # The point of the bucket spanning the largest triangle with the last kept point and the next bucket's mean
+        area = np.abs((x[a] - x[following].mean()) * (y[start:end] - y[a]) -
+                      (x[a] - x[start:end]) * (y[following].mean() - y[a]))
+        indices[bucket + 1] = start + int(np.argmax(area))
+    return indices
+
+
+DOWNSAMPLERS = {"minmax": minmax, "lttb": lttb}
+
+
+def downsample(x, y, points=2000, method="minmax"):
+    """A series cut down to about points for plotting, see minmax() and lttb()"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if method not in DOWNSAMPLERS:
+        raise ValueError("Unknown downsampling method: {0}".format(method))
+    indices = DOWNSAMPLERS[method](x, y, points)
+    return x[indices], y[indices]
+
+
+def draw(figure, time, rebalance, hodl, volumes, points=2000, method="minmax"):
+    """
+    Draws the backtest charts on a figure: rebalancing and hodling portfolio values over time, the percentage gain
+    of rebalancing over hodling, and cumulative traded volume.
+
+    Args:
+        figure (matplotlib.figure.Figure)
+        time (list): closeTimes in milliseconds
+        rebalance (list): rebalanced portfolio value in dollars at each time
+        hodl (list): hodled portfolio value in dollars at each time
+        volumes (list): cumulative traded volume in dollars after each trade
+        points (int, optional): points each line is downsampled to
+        method (str, optional): minmax or lttb
+    """
+    hours = np.asarray(time, dtype=np.float64)
+    hours = (hours - hours[0]) / (1000 * 60 * 60) if len(hours) else hours
+    rebalance = np.asarray(rebalance, dtype=np.float64)
+    hodl = np.asarray(hodl, dtype=np.float64)
+
+    axes = figure.add_subplot(221)
+    axes.plot(*downsample(hours, rebalance, points, method), label="Rebalancing")
+    axes.plot(*downsample(hours, hodl, points, method), label="Hodling")
+    axes.legend()
+    axes.set_ylabel("Portfolio Value $")
+    axes.set_xlabel("Time")
+    axes.set_title("Portfolio value $ over {0:.2f} days.".format(hours[-1] / 24 if len(hours) else 0))
+
+    axes = figure.add_subplot(222)
+    axes.plot(*downsample(hours, (rebalance - hodl) / hodl * 100, points, method))
+    axes.set_ylabel("Portfolio difference (%)")
+    axes.set_xlabel("Time (hours)")
+    axes.set_title("Percentage difference between rebalancing and hodling")
+
+    axes = figure.add_subplot(223)
+    axes.plot(*downsample(np.arange(len(volumes)), volumes, points, method))
+    axes.set_ylabel("Cumulative Volume $")
+    axes.set_xlabel("Trades")
+    axes.set_title("Volume against Trades")
+
+
+def render_backtest(path, time, rebalance, hodl, volumes, points=2000, method="minmax", size=(12, 8), dpi=100):
+    """Writes the backtest charts of draw() to an image file without a display.
+
+    Args:
+        path (str): file to write, its extension picks the format, e.g. .png or .svg
+        size (tuple, optional): inches
+        dpi (int, optional)
+
+    Returns:
+        str: path
+
+    """
+    figure = Figure(figsize=size, dpi=dpi)
+    FigureCanvasAgg(figure)
+    draw(figure, time, rebalance, hodl, volumes, points=points, method=method)
+    figure.tight_layout()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    figure.savefig(path)
+    return path
+
+
+def render_job(job):
+    return render_backtest(**job)
+
+
+def render_many(jobs, workers=None):
+    """Renders several backtests across a process pool.
+
+    Args:
+        jobs (list): dicts of render_backtest() arguments
+        workers (int, optional): processes, defaults to one per core
+
+    Returns:
+        list: paths written, in the order of jobs
+
+    """
+    if len(jobs) == 1:
+        return [render_job(jobs[0])]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        return list(executor.map(render_job, jobs))
@@ -0,0 +1,131 @@
+import logging
+import threading
+from collections import OrderedDict
+import rebalancer.metrics as metrics
+import rebalancer.rate_limit as rate_limit
+
+
+# Longest message Telegram accepts
+MAX_LENGTH = 4096
+
+logger = logging.getLogger(__name__)
+
+
+class Reporter(object):
+    """
+    Sends reports from a background thread so a slow messaging connection never holds up trading.
+
+    Reports are posted as callables that build their text, so the formatting runs on the worker too. A report posted
+    under the key of one still waiting replaces it, or is merged with it, reports waiting for the same recipient are
+    sent together as one message, and once max_pending reports are waiting the oldest is dropped. A failed send is
+    retried with backoff up to max_retries times before its reports are dropped.
+    """
+    def __init__(self, send, max_pending=100, max_retries=3, max_length=MAX_LENGTH):
+        """
+        Args:
+            send (callable): send(recipient, text), e.g. TelegramClient.send_message
+            max_pending (int, optional): reports waiting before the oldest is dropped
+            max_retries (int, optional): retries of a failed send
+            max_length (int, optional): characters per message, longer batches are split between reports
+        """
+        self.send = send
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.max_length = max_length
+        self.pending = OrderedDict()
+        self.condition = threading.Condition()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="reporter", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stops the worker once the reports already waiting are sent"""
+        with self.condition:
+            self.stopped.set()
+            self.condition.notify()
+
+    def post(self, recipient, render, key=None, merge=None):
+        """Queues a report without waiting for it to be sent.
+
+        Args:
+            recipient (str)
+            render (callable): builds the text of the report
+            key (optional): reports of the same recipient and key replace each other while waiting, reports posted
+                without a key never do
+            merge (callable, optional): merge(waiting, render) builds the report that replaces a waiting one, e.g.
+                to keep counts the waiting report held, defaults to render alone
+
+        Returns:
+            bool: False if an older report had to be dropped to make room
+
+        """
+        key = (recipient, key if key is not None else object())
+        dropped = False
+        with self.condition:
+            if key in self.pending:
+                metrics.inc("reports_coalesced_total")
+                waiting = self.pending.pop(key)
+                if merge is not None:
+                    render = merge(waiting, render)
+            elif len(self.pending) >= self.max_pending:
+                self.pending.popitem(last=False)
+                metrics.inc("reports_dropped_total", reason="full")
+                dropped = True
+            self.pending[key] = render
+            self.condition.notify()
+        return not dropped
+
+    def take(self):
+        """Waits for reports, then takes every report waiting, grouped by recipient in the order they were posted"""
+        with self.condition:
+            while not self.pending and not self.stopped.is_set():
+                self.condition.wait()
+            batches = OrderedDict()
+            for (recipient, _), render in self.pending.items():
+                batches.setdefault(recipient, []).append(render)
+            self.pending.clear()
+        return batches
+
+    def run(self):
+        while True:
+            batches = self.take()
+            if not batches and self.stopped.is_set():
+                return
+            for recipient, renders in batches.items():
+                texts = []
+                for render in renders:
+                    try:
+                        texts.append(render())
+                    except Exception as error:
+                        logger.warning("Report could not be built: %s", error)
+                for message in self.messages(texts):
+                    self.deliver(recipient, message)
+
+    def messages(self, texts):
+        """Joins texts into as few messages as fit max_length, cutting any single text that is too long"""
+        messages = []
+        for text in texts:
+            text = text[:self.max_length]
+            if messages and len(messages[-1]) + 2 + len(text) <= self.max_length:
+                messages[-1] += "\n\n" + text
+            else:
+                messages.append(text)
+        return messages
+
+    def deliver(self, recipient, message):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with metrics.timer("report_send_seconds"):
+                    self.send(recipient, message)
+                metrics.inc("reports_sent_total")
+                return
+            except Exception as error:
+                logger.warning("Report to %s failed, attempt %s: %s", recipient, attempt + 1, error)
+                if attempt < self.max_retries and not self.stopped.wait(rate_limit.backoff(attempt)):
+                    continue
+                break
+        metrics.inc("reports_dropped_total", reason="failed")
+        logger.error("Dropped a report message to %s.", recipient)
@@ -0,0 +1,169 @@
+import os
+import numpy as np
+import pandas as pd
+import rebalancer.engine as engine
+import rebalancer.sweep as sweep
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# Log returns attached by each worker process, (SharedMemory, read-only array)
+_shared = {}
+
+
+def outcomes(result):
+    """Final rebalance and hodl growth and the maximum drawdown of every path of a batched BacktestResult"""
+    rebalance, hodl = result.rebalance, result.hodl
+    drawdown = 1 - rebalance / np.maximum.accumulate(rebalance, axis=-1)
+    hodl_drawdown = 1 - hodl / np.maximum.accumulate(hodl, axis=-1)
+    return {"rebalance": rebalance[..., -1] / rebalance[..., 0],
+            "hodl": hodl[..., -1] / hodl[..., 0],
+            "max_drawdown": drawdown.max(axis=-1),
+            "hodl_max_drawdown": hodl_drawdown.max(axis=-1)}
+
+
+def backtest(prices_usd, base_index, targets, fee, threshold=0.0):
+    """Backtests every path of a (paths, ticks, symbols) price array in one pass, starting 1 USD at the targets"""
+    targets = np.asarray(targets, dtype=np.float64)
+    balances = targets / prices_usd[..., 0, :]
+    return outcomes(engine.run_backtest(prices_usd, balances, balances, targets, fee, base_index,
+                                        threshold=threshold, record_trades=False))
+
+
+def walk_forward(prices_usd, base_index, targets, fee, window, step=None, threshold=0.0):
+    """Backtests every rolling window of a price history at once.
+
+    Args:
+        prices_usd (array): (ticks, symbols) USD prices
+        base_index (int): column of BTCUSDT
+        targets (list): target percentages
+        fee (float)
+        window (int): candles per window
+        step (int, optional): candles between window starts, defaults to window // 4
+        threshold (float, optional): see engine.run_backtest()
+
+    Returns:
+        pd.DataFrame: one row per window with its start tick and outcomes()
+
+    """
+    prices_usd = np.asarray(prices_usd, dtype=np.float64)
+    if window < 2 or window > len(prices_usd):
+        raise ValueError("Walk-forward windows must hold between 2 and {0} candles".format(len(prices_usd)))
+    step = step or max(1, window // 4)
+    # (windows, symbols, window) views of the history, moved to (windows, window, symbols) for the engine
+    windows = np.lib.stride_tricks.sliding_window_view(prices_usd, window, axis=0)[::step].swapaxes(-1, -2)
+    frame = pd.DataFrame(backtest(np.ascontiguousarray(windows), base_index, targets, fee, threshold))
+    frame.insert(0, "start", np.arange(len(frame)) * step)
+    return frame
+
+
+def bootstrap(returns, start, paths, ticks, block, rng):
+    """Price paths stitched together from random blocks of historical log returns.
+
+    Blocks are drawn for all symbols at once so their correlation is kept, and a block of 1 resamples single candles.
+
+    Args:
+        returns (array): (candles, symbols) log returns
+        start (array): (symbols) prices every path starts from
+        paths (int)
+        ticks (int): prices per path, including start
+        block (int): candles per block
+        rng (np.random.Generator)
+
+    Returns:
+        array: (paths, ticks, symbols) prices
+
+    """
+    block = max(1, min(block, len(returns)))
+    blocks = -(-(ticks - 1) // block)
+    starts = rng.integers(0, len(returns) - block + 1, size=(paths, blocks))
+    index = (starts[..., None] + np.arange(block)).reshape(paths, -1)[:, :ticks - 1]
+    log_prices = np.concatenate([np.zeros((paths, 1, returns.shape[1])), np.cumsum(returns[index], axis=1)], axis=1)
+    return start * np.exp(log_prices)
+
+
+def share(returns, start):
+    """Places the log returns and starting prices in one shared memory block, the caller unlinks it"""
+    return sweep.share(np.vstack([start[None, :], returns]))
+
+
+def attach(name, shape):
+    """Worker initializer, maps the shared starting prices and log returns without copying them"""
+    block = shared_memory.SharedMemory(name=name)
+    history = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+    history.flags.writeable = False
+    _shared["history"] = (block, history)
+
+
+def evaluate_batch(job):
+    """Bootstraps and backtests one batch of paths from the shared history"""
+    history = _shared["history"][1]
+    rng = np.random.default_rng(job["seed"])
+    prices_usd = bootstrap(history[1:], history[0], job["paths"], job["ticks"], job["block"], rng)
+    return backtest(prices_usd, job["base_index"], job["targets"], job["fee"], job["threshold"])
+
+
+def monte_carlo(prices_usd, base_index, targets, fee, paths=10000, ticks=None, block=24, threshold=0.0, batch=256,
+                workers=None, seed=None):
+    """Backtests block bootstrapped price paths across a process pool.
+
+    The history's log returns are placed in shared memory once, every worker draws and backtests whole batches of
+    paths in one vectorised pass. Batches are seeded from seed so a run can be repeated whatever the number of workers.
+
+    Args:
+        prices_usd (array): (ticks, symbols) USD prices the paths are resampled from
+        base_index (int): column of BTCUSDT
+        targets (list): target percentages
+        fee (float)
+        paths (int, optional)
+        ticks (int, optional): prices per path, defaults to the length of the history
+        block (int, optional): candles per bootstrapped block, 1 resamples single candles
+        threshold (float, optional): see engine.run_backtest()
+        batch (int, optional): paths backtested per pass
+        workers (int, optional): processes, defaults to one per core
+        seed (int, optional)
+
+    Returns:
+        pd.DataFrame: outcomes() of every path
+
+    """
+    prices_usd = np.asarray(prices_usd, dtype=np.float64)
+    if len(prices_usd) < 2:
+        raise ValueError("Bootstrapping needs at least 2 candles of history")
+    returns = np.diff(np.log(prices_usd), axis=0)
+    ticks = ticks or len(prices_usd)
+
+    sizes = [min(batch, paths - done) for done in range(0, paths, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [{"seed": child, "paths": size, "ticks": ticks, "block": block, "base_index": base_index,
+             "targets": list(targets), "fee": fee, "threshold": threshold}
+            for child, size in zip(seeds, sizes)]
+
+    block_memory = share(returns, prices_usd[0])
+    try:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach,
+                                 initargs=(block_memory.name, (len(returns) + 1, returns.shape[1]))) as executor:
+            results = list(executor.map(evaluate_batch, jobs))
+    finally:
+        block_memory.close()
+        block_memory.unlink()
+
+    return pd.DataFrame({name: np.concatenate([result[name] for result in results]) for name in results[0]})
+
+
+def summarize(frame):
+    """Mean and quantiles of the rebalance and hodl outcomes of a walk_forward() or monte_carlo() frame.
+
+    Returns:
+        pd.DataFrame: one row per outcome, including the excess growth of rebalancing over hodling
+
+    """
+    frame = frame.assign(excess=frame["rebalance"] / frame["hodl"] - 1)
+    columns = ["rebalance", "hodl", "excess", "max_drawdown", "hodl_max_drawdown"]
+    summary = frame[columns].quantile(QUANTILES).T
+    summary.columns = ["q{0:g}".format(quantile * 100) for quantile in QUANTILES]
+    summary.insert(0, "mean", frame[columns].mean())
+    return summary
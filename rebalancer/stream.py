@@ -0,0 +1,146 @@
+import json
+import logging
+import queue
+import threading
+import rebalancer.binance_api as api
+import rebalancer.rate_limit as rate_limit
+
+
+STREAM_ENDPOINT = "wss://stream.binance.com:9443"
+
+logger = logging.getLogger(__name__)
+
+
+class PriceStream(object):
+    """
+    Publishes (symbol, price) updates from a background thread onto a queue. Subclasses implement run(), calling
+    publish() for every price they receive until stopped is set.
+    """
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=type(self).__name__, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        raise NotImplementedError
+
+    def publish(self, symbol, price):
+        self.queue.put((symbol, price))
+
+    def drain(self, timeout=None):
+        """Waits up to timeout seconds for an update, then takes every update already queued.
+
+        Returns:
+            dict: latest price of each updated symbol, empty if nothing arrived in time
+
+        """
+        updates = {}
+        try:
+            symbol, price = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return updates
+        updates[symbol] = price
+        while True:
+            try:
+                symbol, price = self.queue.get_nowait()
+            except queue.Empty:
+                return updates
+            updates[symbol] = price
+
+
+class FeedStream(PriceStream):
+    """Replays a local feed of (symbol, price) updates, e.g. recorded prices or a test scenario, then stops."""
+    def __init__(self, updates, delay=0.0):
+        """
+        Args:
+            updates (iterable): (symbol, price)
+            delay (float, optional): seconds between updates
+        """
+        super().__init__()
+        self.updates = updates
+        self.delay = delay
+
+    def run(self):
+        for symbol, price in self.updates:
+            if self.stopped.wait(self.delay):
+                return
+            self.publish(symbol, price)
+        self.stopped.set()
+
+
+class PollingStream(PriceStream):
+    """Polls binance_api.prices() and publishes the portfolio prices that changed, for endpoints without a stream."""
+    def __init__(self, symbols, interval=1.0):
+        super().__init__()
+        self.symbols = list(symbols)
+        self.interval = interval
+
+    def run(self):
+        last = {}
+        while not self.stopped.is_set():
+            try:
+                prices = api.prices()
+            except ValueError as error:
+                logger.warning("Price poll failed: %s", error)
+                prices = {}
+            for symbol in self.symbols:
+                if symbol in prices and prices[symbol] != last.get(symbol):
+                    last[symbol] = prices[symbol]
+                    self.publish(symbol, float(prices[symbol]))
+            self.stopped.wait(self.interval)
+
+
+class TickerStream(PriceStream):
+    """
+    Publishes last prices from the exchange's combined miniTicker WebSocket stream, reconnecting with backoff.
+    Needs the websocket-client package.
+    """
+    def __init__(self, symbols, endpoint=STREAM_ENDPOINT, timeout=5):
+        # Only this stream needs websocket-client, so it is not imported until one is built
+        try:
+            import websocket
+        except ImportError:
+            raise ImportError("The websocket price stream needs websocket-client, pip install websocket-client")
+        self.websocket = websocket
+        super().__init__()
+        self.symbols = list(symbols)
+        self.endpoint = endpoint.rstrip("/")
+        self.timeout = timeout
+
+    def url(self):
+        return "{0}/stream?streams={1}".format(self.endpoint, "/".join(symbol.lower() + "@miniTicker"
+                                                                      for symbol in self.symbols))
+
+    def run(self):
+        websocket = self.websocket
+        attempt = 0
+        while not self.stopped.is_set():
+            try:
+                connection = websocket.create_connection(self.url(), timeout=self.timeout)
+            except (websocket.WebSocketException, OSError) as error:
+                logger.warning("Price stream connection failed: %s", error)
+                self.stopped.wait(rate_limit.backoff(attempt))
+                attempt += 1
+                continue
+
+            logger.info("Price stream connected")
+            attempt = 0
+            try:
+                while not self.stopped.is_set():
+                    try:
+                        message = json.loads(connection.recv())
+                    except websocket.WebSocketTimeoutException:
+                        continue
+                    data = message.get("data", message)
+                    self.publish(data["s"], float(data["c"]))
+            except (websocket.WebSocketException, OSError, ValueError, KeyError) as error:
+                logger.warning("Price stream disconnected: %s", error)
+            finally:
+                connection.close()
@@ -0,0 +1,118 @@
+import itertools
+import os
+import random
+import numpy as np
+import pandas as pd
+import rebalancer.engine as engine
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+
+# Price matrices attached by each worker process, candle_time to (SharedMemory, read-only array)
+_shared = {}
+_base_index = None
+
+
+def grid(candle_times, thresholds, fees, targets, samples=None, seed=None):
+    """Every combination of sweep parameters, or a random sample of them.
+
+    Args:
+        candle_times (list)
+        thresholds (list): drift from target before a coin is traded
+        fees (list)
+        targets (list): target percentages per configuration, in portfolio.csv order
+        samples (int, optional): number of configurations drawn without replacement
+        seed (int, optional): seed of the sample
+
+    Returns:
+        list: dicts of candle_time, threshold, fee and targets
+
+    """
+    combinations = [{"candle_time": candle_time, "threshold": threshold, "fee": fee, "targets": list(target)}
+                    for candle_time, threshold, fee, target in itertools.product(candle_times, thresholds,
+                                                                                fees, targets)]
+    if samples is not None and samples < len(combinations):
+        combinations = random.Random(seed).sample(combinations, samples)
+    return combinations
+
+
+def evaluate(prices_usd, base_index, params):
+    """Backtests one configuration, starting from a portfolio of 1 USD already at its targets.
+
+    Args:
+        prices_usd (array): (ticks, symbols) USD prices
+        base_index (int): column of BTCUSDT
+        params (dict): see grid()
+
+    Returns:
+        dict: params with the final rebalance and hodl totals, profit against hodling and maximum drawdown
+
+    """
+    targets = np.asarray(params["targets"], dtype=np.float64)
+    balances = targets / prices_usd[0]
+    result = engine.run_backtest(prices_usd, balances, balances, targets, params["fee"], base_index,
+                                 threshold=params["threshold"], record_trades=False)
+
+    rebalance = result.rebalance
+    drawdown = 1 - rebalance / np.maximum.accumulate(rebalance)
+    return dict(params,
+                rebalance=rebalance[-1],
+                hodl=result.hodl[-1],
+                profit=rebalance[-1] / result.hodl[-1] - 1,
+                max_drawdown=drawdown.max())
+
+
+def share(prices_usd):
+    """Copies a price matrix into a new shared memory block, the caller unlinks it"""
+    block = shared_memory.SharedMemory(create=True, size=max(prices_usd.nbytes, 1))
+    np.ndarray(prices_usd.shape, dtype=np.float64, buffer=block.buf)[:] = prices_usd
+    return block
+
+
+def attach(blocks, base_index):
+    """Worker initializer, maps every shared price matrix without copying it"""
+    global _base_index
+    _base_index = base_index
+    for candle_time, (name, shape) in blocks.items():
+        block = shared_memory.SharedMemory(name=name)
+        prices_usd = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+        prices_usd.flags.writeable = False
+        _shared[candle_time] = (block, prices_usd)
+
+
+def evaluate_shared(params):
+    return evaluate(_shared[params["candle_time"]][1], _base_index, params)
+
+
+def run(prices_usd, base_index, configurations, workers=None):
+    """Backtests configurations across a process pool.
+
+    Each price matrix is placed in shared memory once and every worker maps the same read-only copy.
+
+    Args:
+        prices_usd (dict): candle_time to (ticks, symbols) USD prices
+        base_index (int): column of BTCUSDT
+        configurations (list): see grid()
+        workers (int, optional): processes, defaults to one per core
+
+    Returns:
+        pd.DataFrame: one row per configuration, ranked by profit against hodling
+
+    """
+    blocks = {candle_time: share(np.ascontiguousarray(prices, dtype=np.float64))
+              for candle_time, prices in prices_usd.items()}
+    try:
+        shapes = {candle_time: (blocks[candle_time].name, np.shape(prices))
+                  for candle_time, prices in prices_usd.items()}
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach, initargs=(shapes, base_index)) as executor:
+            chunksize = max(1, len(configurations) // (workers * 4))
+            results = list(executor.map(evaluate_shared, configurations, chunksize=chunksize))
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+    frame = pd.DataFrame(results, columns=["candle_time", "threshold", "fee", "targets",
+                                           "rebalance", "hodl", "profit", "max_drawdown"])
+    return frame.sort_values(by="profit", ascending=False).reset_index(drop=True)
@@ -1,12 +1,25 @@
-import csv
 import time
 import sched
 import os
 import datetime
+import asyncio
+import functools
+import logging
 import rebalancer.binance_api as api
+import rebalancer.async_api as async_api
+import rebalancer.conversion as conversion
+import rebalancer.execution as execution
+import rebalancer.journal as journal
+import rebalancer.metrics as metrics
+import rebalancer.recorder as recorder
+import rebalancer.reporting as reporting
+from rebalancer.drift import DriftTracker
+from rebalancer.exchange_info import ExchangeInfo
+from rebalancer.kline_store import KlineStore
+from rebalancer.portfolio import Portfolio
 import pandas as pd
 
-from rebalancer.graphics import plot_portfolio_backtest as plt
+logger = logging.getLogger(__name__)
 
 
 class Tester(object):
@@ -16,7 +29,7 @@ class Tester(object):
 
     All common information needed for the two different testers are initialised within the Binance superclass.
     """
-    def __init__(self, config):
+    def __init__(self, config, exchange_info=None, market_data=None, account=None):
         """
         Remember to set your environment variables for API_KEY and SERCET_KEY. Use os.environ["API_KEY"] = ... and
         os.environ["SECRT_KEY"] = ... to set environment variables, input must be a string.
@@ -26,6 +39,10 @@ class Tester(object):
 
         Args:
             config (dict): configuration dictionary from config.yaml
+            exchange_info (ExchangeInfo, optional): index shared with other testers, loaded from config otherwise
+            market_data (optional): prices() and tickers() provider shared with other testers, binance_api otherwise
+            account (binance_api.Account, optional): keys of this tester, which then leaves the environment keys
+                and the shared API configuration alone, see orchestrator.Orchestrator
 
         :transaction_fee (float): percentage fee for binance from config.yaml
         :min_btc_order (float): as stated
@@ -39,16 +56,32 @@ class Tester(object):
         :secret (str): secret_key needed for signedRequest, found in environment variables
         """
 
-        self.data = self.portfolio_csv()
+        self.data = self.portfolio_csv(config.get("portfolio") or "./rebalancer/portfolio.csv")
+        self.portfolio = Portfolio(list(self.data.index), self.data['target'].astype(float))
 
         self.all_balances = {}
         self.all_prices = {}
 
-        self.exchange_info = api.get_exchange_info()
+        self.account = account
+        self.market_data = market_data or api
+        self.recorder = None
+        if account is None:
+            api.configure(pool_size=config.get("http_pool_size"), timeout=config.get("http_timeout"),
+                          max_retries=config.get("http_max_retries"), weight_limit=config.get("weight_limit"),
+                          order_limit=config.get("order_limit"), endpoint=config.get("endpoint"))
+            async_api.configure(max_concurrency=config.get("max_concurrency"))
+
+        self.exchange_info = exchange_info or ExchangeInfo(config.get("exchange_info_cache")
+                                                           or "./rebalancer/exchange_info.json",
+                                                           ttl=config.get("exchange_info_ttl") or 24 * 60 * 60)
         self.transaction_fee = config["transaction_fee"]
         self.min_btc_order = config["minimum_btc_order"]
         self.maxOrdertime = config["open_order_time_limit"]
         self.candle_time = config["candle_time"]
+        self.kline_store = KlineStore(config.get("kline_store") or "./rebalancer/klines")
+        self.kline_offline = config.get("kline_offline", False)
+        self.kline_history_days = config.get("kline_history_days")
+        self.kline_workers = config.get("kline_workers") or 8
         self.get_portfolio_lot_sizes()
         self.current_time = 0
 
@@ -60,131 +93,99 @@ class Tester(object):
         self.number_of_trades = 0
         self.volume_of_trades = 0
 
-        key = os.environ.get("API_KEY")
-        secret = os.environ.get("SECRET_KEY")
+        if account is None:
+            key = os.environ.get("API_KEY")
+            secret = os.environ.get("SECRET_KEY")
 
-        if None in [key, secret]:
-            raise ValueError("Check environment variables")
+            if None in [key, secret]:
+                raise ValueError("Check environment variables")
 
-        api.set(key, secret)
+            api.set(key, secret)
 
         self.portfolio_total = 0
         self.hodl_total = 0
 
-    def update(self):
+    def labels(self):
+        """Metric labels of the account this tester trades, none when it trades the only one"""
+        return {"account": self.account.name} if self.account is not None else {}
+
+    async def fetch(self, *calls):
+        """Fetches balances and prices, and the results of any other calls, concurrently"""
+        logger.debug("Fetching balances and prices")
+        return await asyncio.gather(async_api.balances(), async_api.call(self.market_data.prices),
+                                    *[async_api.call(function) for function in calls])
+
+    def update(self, fetch=True):
         """
         Used for live tester only.
         Takes prices and balances on exchange, calculates required info, puts into one dataframe.
-        """
-        print("Fetching balances:")
-        self.all_balances = api.balances()
 
-        print("Fetching prices: ")
-        self.all_prices = api.prices()
+        Args:
+            fetch (bool, optional): False to reuse all_balances and all_prices, already fetched
+        """
+        if fetch:
+            with metrics.timer("rebalance_phase_seconds", phase="fetch", **self.labels()):
+                self.all_balances, self.all_prices = async_api.run(self.fetch())
+            self.record_snapshots()
+        start_time = time.perf_counter()
 
         self.data['binance_balances'] = pd.Series({symbols: float(self.all_balances[coin]["free"])
                                                    for symbols, coin in zip(self.data.index, self.data['coin_name'])})
-
-        self.data['portfolio_balances'] = pd.Series({symbols: self.data.loc[symbols, 'binance_balances']
-                                                     - float(self.data.loc[symbols, 'protected_balance'])
-                                                     for symbols in self.data.index})
-
-        # Filters all_prices to portfolio prices
-        self.data['portfolio_prices'] = pd.Series({symbols: float(self.all_prices[symbols]) for symbols in self.data.index})
-
-        # Converts all prices to USD value
-        self.get_portfolio_prices_usd()
-
-        # Calculate amount of each coin held in terms of USD
-        self.data['total_usd'] = pd.Series({symbols: self.data['portfolio_balances'][symbols] *
-                                            self.data['portfolio_prices_usd'][symbols] for symbols in self.data.index})
-        self.data['total_usd_hodl'] = pd.Series({symbols: self.data['hodl_balances'][symbols] *
-                                                 self.data['portfolio_prices_usd'][symbols] for symbols in self.data.index})
-
-        # Calculates the total value of the portfolio
-        self.portfolio_total = sum(self.data['total_usd'])
-        self.hodl_total = sum(self.data['total_usd_hodl'])
-
-        # Calculates the percentages of each coin in portfolio in USD
-        self.data['percentages'] = pd.Series({symbols: self.data['portfolio_prices_usd'][symbols] *
-                                              self.data['portfolio_balances'][symbols] / self.portfolio_total
-                                              for symbols in self.data.index})
-
-        # Calculate percentage differences from target percentages for each coin
-        self.data['percentage_diffs'] = pd.Series({symbols: float(self.data['target'][symbols]) -
-                                                   self.data['percentages'][symbols]
-                                                   for symbols in self.data.index})
-
-        # Calculate required purchase volume for each coin
-        self.data['purchase_volumes'] = pd.Series({symbols: self.data['percentage_diffs'][symbols] *
-                                                   self.portfolio_total /
-                                                   self.data['portfolio_prices_usd'][symbols]
-                                                   for symbols in self.data.index})
-
-        # Calculate USD value of purchase volume
-        self.data['trade_volumes'] = pd.Series({symbols: self.data['purchase_volumes'][symbols] * self.data['portfolio_prices_usd'][symbols]
-                                                for symbols in self.data.index})
-
-        self.buy_or_sell()
-
-    def get_portfolio_prices_usd(self):
-        """Calculates the dollar value of each coin, the currency the portfolio is matched against"""
-        usd_values = {}
-
-        for symbol in self.data.index:
-            if symbol != "BTCUSDT":
-                usd_values[symbol] = self.data['portfolio_prices'][symbol] \
-                                     * self.data['portfolio_prices']["BTCUSDT"]
-            else:
-                usd_values[symbol] = self.data['portfolio_prices'][symbol]
-        self.data['portfolio_prices_usd'] = pd.Series(usd_values)
-
-    def buy_or_sell(self):
-        """Determines whether the coin needs to be bought or sold"""
-        if_buy = {}
-        for symbols in self.data.index:
-            if self.data['trade_volumes'][symbols] >= self.min_btc_order * self.data['portfolio_prices_usd']["BTCUSDT"]:
-                if_buy[symbols] = True
-            elif self.data['trade_volumes'][symbols] <= -self.min_btc_order * \
-                    self.data['portfolio_prices_usd']["BTCUSDT"]:
-                if_buy[symbols] = False
-            else:
-                if_buy[symbols] = None
-        self.data['if_buy'] = pd.Series(if_buy)
+        self.portfolio.set_balances(self.data['binance_balances'] - self.data['protected_balance'].astype(float),
+                                    hodl_balances=self.data['hodl_balances'])
+        self.portfolio.set_prices(self.all_prices)
+        self.write_portfolio()
+        metrics.observe("rebalance_phase_seconds", time.perf_counter() - start_time, phase="compute", **self.labels())
+
+    def record_snapshots(self, **snapshots):
+        """Records the balances and prices just fetched, and any other snapshots given by kind, if recording"""
+        if self.recorder is not None:
+            self.recorder.record(recorder.BALANCES, self.all_balances)
+            self.recorder.record(recorder.PRICES, self.all_prices)
+            for kind, snapshot in snapshots.items():
+                self.recorder.record(kind, snapshot)
+
+    def write_portfolio(self):
+        """Copies the values of the portfolio state into the columns of self.data"""
+        for name, column in self.portfolio.columns(self.min_btc_order).items():
+            self.data[name] = column
+        self.portfolio_total = self.portfolio.total
+        self.hodl_total = self.portfolio.hodl_total
 
     def get_portfolio_lot_sizes(self):
-        """Extracts useful information of LOT_SIZE from exchange_info for portfolio coins only"""
-        lot_size_dict = {}
-        for symbols in self.exchange_info["symbols"]:
-            for filters in symbols["filters"]:
-                if filters["filterType"] == "LOT_SIZE":
-                    lot_size_dict[symbols["symbol"]] = {"maxQty": filters["maxQty"],
-                                                        "minQty": filters["minQty"],
-                                                        "stepSize": filters["stepSize"]}
-        self.data['portfolio_lot_sizes'] = pd.Series({symbols:
-                                                      lot_size_dict[symbols]['minQty'] for symbols in self.data.index})
-
-    def portfolio_csv(self):
+        """Reads LOT_SIZE minimum quantities of portfolio coins from the exchange info index"""
+        self.data['portfolio_lot_sizes'] = pd.Series({symbols: '{0:.8f}'.format(self.exchange_info[symbols].min_qty)
+                                                      for symbols in self.data.index})
+
+    def portfolio_csv(self, path="./rebalancer/portfolio.csv"):
         """Gets list of relevant tradings symbols for rebalancing algorithm form portfolio.csv"""
-        reader = pd.read_csv("./rebalancer/portfolio.csv", index_col=1)
+        reader = pd.read_csv(path, index_col=1)
         if len(reader) < 2:
             raise ValueError("The number of coins/tokens in portfolio must be greater than 1.")
         return reader
 
-    def get_portfolio_klines(self):
-        """Uses get_previous_closes() to make a single dict for backtest price information"""
-        self.portfolio_klines = [api.klines(symbols, interval=self.candle_time, limit=1000) for symbols in self.data.index]
+    def get_portfolio_klines(self, interval=None):
+        """
+        Brings the local kline store up to date, unless running offline, and returns the stored close prices of the
+        portfolio as one dataframe for backtest price information
 
-        format_portfolio_klines = pd.DataFrame()
+        Args:
+            interval (str, optional): defaults to candle_time
+        """
+        interval = interval or self.candle_time
+        if not self.kline_offline:
+            start = None
+            if self.kline_history_days:
+                start = int((time.time() - self.kline_history_days * 24 * 60 * 60) * 1000)
+            logger.info("Syncing %s klines", interval)
+            self.kline_store.sync(list(self.data.index), interval, start=start, max_workers=self.kline_workers)
 
-        for names, info in zip(self.data.index, self.portfolio_klines):
-            format_portfolio_klines[names] = pd.Series({close['closeTime']: close['close'] for close in info})
-        return format_portfolio_klines
+        return self.kline_store.closes(list(self.data.index), interval)
 
 
 class LiveTester(Tester):
-    def __init__(self, config_uri):
-        super().__init__(config_uri)
+    def __init__(self, config_uri, exchange_info=None, market_data=None, account=None):
+        super().__init__(config_uri, exchange_info=exchange_info, market_data=market_data, account=account)
 
         self.init_time = datetime.datetime.now()
 
@@ -196,194 +197,498 @@ class LiveTester(Tester):
         self.is_test = self.config["livetest_test"]
         self.no_rebalances = 0
 
-        self.all_open_orders = []
+        self.depth_limit = self.config.get("execution_depth_limit") or 20
+        self.participation = self.config.get("execution_participation") or 1.0
+        self.max_slippage = self.config.get("execution_max_slippage") or 0.005
+        self.max_children = self.config.get("execution_max_children") or 5
 
-        self.data['hodl_balances'] = self.data['protected_balance']
-        self.trunk_quantity()
+        self.first_rebalance = None
+
+        self.rebalance_mode = self.config.get("rebalance_mode") or "schedule"
+        if self.rebalance_mode not in ("schedule", "stream"):
+            raise ValueError("Unknown rebalance mode: {0}".format(self.rebalance_mode))
+        self.drift_band = self.config.get("drift_band") or 0.02
+        self.stream_cooldown = self.config.get("stream_cooldown")
+        if self.stream_cooldown is None:
+            self.stream_cooldown = 30
+        self.tracker = None
 
         self.time_binance = []
         self.rebalance = []
         self.hodl = []
+        if self.config.get("record_path"):
+            # Rebalances recorded before a restart carry on from where they stopped
+            for at, _, data in recorder.LogReader(self.config["record_path"]).records(kinds={recorder.REBALANCE}):
+                self.time_binance.append(at)
+                self.rebalance.append(data["total"])
+                self.hodl.append(data["hodl_total"])
+            self.recorder = recorder.Recorder(self.config["record_path"],
+                                              chunk_records=self.config.get("record_chunk_records") or 256,
+                                              chunk_seconds=self.config.get("record_chunk_seconds") or 5).start()
+
+        # The startup requests go out together, then update() below reuses the balances and prices
+        with metrics.timer("rebalance_phase_seconds", phase="fetch", **self.labels()):
+            self.all_balances, self.all_prices, tickers = async_api.run(self.fetch(self.market_data.tickers))
+        self.record_snapshots(tickers=tickers)
+
+        # Coins are valued through the cheapest markets to valuation_asset, so portfolio.csv may hold any quote asset
+        self.converter = conversion.Converter(conversion.markets(self.exchange_info),
+                                              list(self.data['coin_name']) + ["BTC"],
+                                              valuation=self.config.get("valuation_asset") or "USDT",
+                                              spreads=conversion.spreads(tickers),
+                                              hop_cost=self.transaction_fee)
+        self.portfolio = Portfolio(list(self.data.index), self.data['target'].astype(float),
+                                   converter=self.converter)
+
+        self.order_journal = journal.OrderJournal(self.config.get("journal_path") or "./rebalancer/open_orders.journal",
+                                                  self.config.get("open_orders_path") or "./rebalancer/open_orders.csv",
+                                                  compact_every=self.config.get("journal_compact_every") or 1000,
+                                                  recorder=self.recorder)
+        self.all_open_orders = self.order_journal.replay()
 
-        self.update()
+        self.data['hodl_balances'] = self.data['protected_balance']
+
+        self.update(fetch=False)
         self.data['hodl_balances'] = self.data['portfolio_balances']
-        self.data['total_usd_hodl'] = pd.Series({symbols: self.data['hodl_balances'][symbols] *
-                                                 self.data['portfolio_prices_usd'][symbols] for symbols in
-                                                 self.data.index})
-        self.hodl_total = sum(self.data['total_usd_hodl'])
+        self.portfolio.set_balances(self.portfolio.balances, hodl_balances=self.data['hodl_balances'])
+        self.write_portfolio()
 
         self.username = self.config['username']
         self.client = ''
+        self.reporter = None
 
         self.s = sched.scheduler(time.time, time.sleep)
+        self.due = {}
+
+        self.metrics_exporter = None
+        self.metrics_server = None
+        if self.config.get("metrics_file"):
+            self.metrics_exporter = metrics.FileExporter(self.config["metrics_file"],
+                                                         interval=self.config.get("metrics_interval") or 60).start()
+        if self.config.get("metrics_port"):
+            self.metrics_server = metrics.serve(self.config["metrics_port"])
 
-    def trunk_quantity(self):
-        for k, v in self.data['portfolio_lot_sizes'].items():
-            num = v.find("1")
-            if num == 0:
-                self.data.loc[k, 'portfolio_lot_sizes'] = int(float(v))
-            elif num > 1:
-                num -= 1
-                format_string = ("%.{}f".format(num))
-                self.data.loc[k, 'portfolio_lot_sizes'] = float(format_string % float(v))
-
-    def execute_buy_or_sell(self, symbol):
-        if self.data.loc[symbol, "if_buy"] is None:
-            pass
-        elif self.data.loc[symbol, 'if_buy'] is True:
-            print("Posting BUY order: ")
-            infos = api.order(symbol, api.BUY, self.data.loc[symbol, 'purchase_volume'],
-                              '{0:.8f}'.format(self.data.loc[symbol, "portfolio_prices"]), test=self.is_test)
-            print("Order placed to BUY {0} {1} for {2} BTC per unit.".format(self.data.loc[symbol, "purchase_volumes"],
-                                                                             symbol[:3],
-                                                                             '{0:.8f}'.format(self.data.loc[symbol, "portfolio_prices"])))
-
-            print(infos)
-            print()
-        elif self.data.loc[symbol, "if_buy"] is False:
-            print("Posting {0} order: ".format(self.data.loc[symbol, "if_buy"]))
-            infos = api.order(symbol, api.SELL, -1 * self.data.loc[symbol, "purchase_volume"],
-                              '{0:.8f}'.format(self.data.loc[symbol, "portfolio_prices"]), test=self.is_test)
-            print("Order placed to SELL {0} {1} for {2} BTC per unit.".format((-1 * self.data.loc[symbol, "purchase_volumes"]),
-                                                                              symbol[0][:3],
-                                                                              '{0:.8f}'.format(self.data.loc[symbol, "portfolio_prices"])))
-            print(infos)
-            print()
-        self.volume_of_trades += abs(self.data.loc[symbol, 'trade_volumes'])
-        self.number_of_trades += 1
+        metrics.set("startup_seconds", time.time() - metrics.STARTED, **self.labels())
+
+    def plan_orders(self):
+        """
+        Every order of this rebalance from the portfolio arrays, rounded to the symbol filters and without the orders
+        below the minimum quantity or notional, before anything is sent. BTCUSDT only values the portfolio and is
+        never traded.
+        """
+        symbols = self.portfolio.symbols
+        sides = self.portfolio.sides(self.min_btc_order)
+        quantities = [volume if side is not None and symbol != "BTCUSDT" else 0.0
+                      for symbol, side, volume in zip(symbols, sides, self.portfolio.purchase_volumes().tolist())]
+        return execution.batch(symbols, quantities, self.portfolio.prices,
+                               [self.exchange_info[symbol] for symbol in symbols])
+
+    async def execute_order(self, order):
+        """
+        Plans an order against its order book, then posts the child orders concurrently. Children are priced on book
+        levels from the touch outwards, any volume beyond the slippage budget waits for the next rebalance.
+        """
+        symbol, side = order.symbol, order.side
+        book = execution.Book.from_depth(symbol, await async_api.depth(symbol, limit=self.depth_limit))
+        filters = self.exchange_info[symbol]
+        order_plan = execution.plan(side, float(order.quantity), book, step_size=filters.step_size,
+                                    min_qty=filters.min_qty, min_notional=filters.min_notional,
+                                    participation=self.participation, max_slippage=self.max_slippage,
+                                    max_children=self.max_children, tick_size=filters.tick_size)
+        coin = self.data.loc[symbol, "coin_name"]
+        if order_plan.slippage is not None:
+            metrics.set("execution_slippage", order_plan.slippage, symbol=symbol, **self.labels())
+        logger.info("Planned %s of %s %s in %s orders at an expected %.4f%% slippage, %.8f left for the next "
+                    "rebalance.", side, sum(child.quantity for child in order_plan.children), coin,
+                    len(order_plan.children), 100 * (order_plan.slippage or 0.0), order_plan.unplanned)
+
+        async def post(child):
+            """Posts a child order, returns its quantity if it was placed and 0 if rejected"""
+            infos = await async_api.order(symbol, side, child.quantity, child.price, test=self.is_test)
+            if "code" in infos:
+                logger.warning("Order to %s %s %s for %s BTC per unit rejected: %s", side, child.quantity, coin,
+                               child.price, infos.get("msg"))
+                return 0.0
+            logger.info("Order placed to %s %s %s for %s BTC per unit.", side, child.quantity, coin, child.price)
+            logger.debug(infos)
+            self.journal_placed(infos)
+            return float(child.quantity)
+
+        placed = [quantity for quantity in await asyncio.gather(*(post(child) for child in order_plan.children))
+                  if quantity]
+        if placed:
+            # The volume of the rebalance, in proportion to the share of it actually placed
+            self.volume_of_trades += abs(self.data.loc[symbol, 'trade_volumes']) * sum(placed) / float(order.quantity)
+            self.number_of_trades += len(placed)
+
+    def journal_placed(self, infos):
+        """Journals and tracks a new order from its order response, test orders have no orderId and are skipped"""
+        if "orderId" not in infos:
+            return
+        order = dict(infos, time=infos.get("transactTime", time.time() * 1000))
+        self.order_journal.record(journal.PLACED, order)
+        self.all_open_orders.add(order)
+        metrics.inc("orders_placed_total", symbol=order["symbol"], side=order["side"], **self.labels())
+
+    async def execute_all(self, orders):
+        """Posts every sell concurrently, then every buy once the sells are in, so freed BTC is there to buy with"""
+        for side in (api.SELL, api.BUY):
+            await asyncio.gather(*(self.execute_order(order) for order in orders if order.side == side))
 
     def get_all_open_orders(self):
-        self.all_open_orders = []
-
-        for symbols in self.data.index:
-            if symbols != "BTCUSDT":
-                print("Fetching open orders for {0}: ".format(symbols))
-                orders = api.openOrders(symbols)
-                if orders is not None:
-                    for elems in orders:
-                        self.all_open_orders.append({"orderId": elems["orderId"],
-                                                     "origQty": elems["origQty"],
-                                                     "price": elems["price"],
-                                                     "side": elems["side"],
-                                                     "symbol": elems["symbol"],
-                                                     "time": elems["time"]})
-        self.all_open_orders.sort(key=lambda x: x["time"])
+        """Syncs the tracked open orders with one account wide snapshot, orders outside the portfolio are ignored"""
+        logger.debug("Fetching open orders")
+        orders = api.openOrders()
+        if orders is not None:
+            added, closed = self.all_open_orders.sync([elems for elems in orders if elems["symbol"] in self.data.index
+                                                       and elems["symbol"] != "BTCUSDT"])
+            for elems in added:
+                self.order_journal.record(journal.PLACED, elems)
+            filled, cancelled = self.settle(closed) if closed else ([], [])
+            for elems in filled:
+                self.order_journal.record(journal.FILLED, elems)
+                metrics.observe("order_fill_seconds", time.time() - elems["time"] / 1000, symbol=elems["symbol"],
+                                **self.labels())
+            for elems in cancelled:
+                self.order_journal.record(journal.CANCELLED, elems)
+            metrics.set("open_orders", len(self.all_open_orders), **self.labels())
+            return filled + cancelled
+        return []
+
+    def settle(self, closed):
+        """
+        Looks up, as one concurrent batch, whether orders that left the book filled or were cancelled, by hand or by
+        the exchange. An order cancelled after a partial fill counts as cancelled. Orders whose status could not be
+        fetched are tracked again, so the next sync retries them.
+
+        Returns:
+            tuple: lists of the filled and the cancelled orders
+
+        """
+        async def status_all():
+            return await asyncio.gather(*(async_api.orderStatus(elems["symbol"], orderId=elems["orderId"])
+                                          for elems in closed), return_exceptions=True)
+
+        filled, cancelled = [], []
+        for elems, infos in zip(closed, async_api.run(status_all())):
+            if isinstance(infos, Exception) or ("code" in infos and infos["code"] != api.NO_SUCH_ORDER):
+                error = infos if isinstance(infos, Exception) else infos.get("msg")
+                logger.warning("Status of order %s for %s unknown: %s", elems["orderId"], elems["symbol"], error)
+                self.all_open_orders.add(elems)
+            elif infos.get("status") == "FILLED":
+                filled.append(elems)
+            elif infos.get("status") in ("NEW", "PARTIALLY_FILLED"):
+                # Placed or still filling after the snapshot was taken
+                self.all_open_orders.add(elems)
+            else:
+                # Cancelled, expired, rejected, or archived by the exchange without ever filling
+                cancelled.append(elems)
+        return filled, cancelled
 
     def check_cancel(self):
-        for elems in self.all_open_orders:
-            if (time.time() * 1000) - elems["time"] >= self.maxOrdertime:
-                print("Cancelling {0} order: ".format(elems["side"]))
-                api.cancel(elems["symbol"], orderId=elems["orderId"])
-                print("Order CANCELLED for {0}ing of {1} {2} at {3} BTC per unit. \n".format(elems["side"],
-                                                                                             elems["origQty"],
-                                                                                             elems["symbol"][:3],
-                                                                                             elems["price"]))
-                self.all_open_orders.remove(elems)
+        """
+        Cancels every open order older than the open order time limit, as one concurrent batch. An order whose cancel
+        failed, e.g. because it filled in the meantime, stays tracked and the next open orders sync settles it.
+        """
+        expired = self.all_open_orders.due(time.time() * 1000 - self.maxOrdertime)
+        if not expired:
+            return
+
+        async def cancel_all():
+            return await asyncio.gather(*(async_api.cancel(elems["symbol"], orderId=elems["orderId"])
+                                          for elems in expired), return_exceptions=True)
+
+        logger.debug("Cancelling %s orders", len(expired))
+        for elems, infos in zip(expired, async_api.run(cancel_all())):
+            if isinstance(infos, Exception) or "code" in infos:
+                error = infos if isinstance(infos, Exception) else infos.get("msg")
+                logger.warning("Cancel of order %s for %s failed: %s", elems["orderId"], elems["symbol"], error)
+                self.all_open_orders.add(elems)
+                continue
+            self.order_journal.record(journal.EXPIRED, elems)
+            metrics.inc("orders_expired_total", **self.labels())
+            logger.info("Order CANCELLED for %sing of %s %s at %s BTC per unit.", elems["side"], elems["origQty"],
+                        elems["symbol"][:3], elems["price"])
 
     def write_open_orders(self):
-        with open("./rebalancer/open_orders.csv", 'r') as file:
-            reader = csv.DictReader(file)
-            fieldnames = reader.fieldnames
-
-        with open("./rebalancer/open_orders.csv", 'w') as file:
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            for rows in self.all_open_orders:
-                writer.writerow(rows)
+        """Compacts the order journal into open_orders.csv once enough events have been appended"""
+        self.order_journal.maybe_compact(self.all_open_orders)
 
     def open_orders_handling(self):
-        start_time = time.time()
+        """Checks, cancels and journals open orders, returns the orders that closed since the last check"""
+        start_time = time.perf_counter()
 
-        self.get_all_open_orders()
+        closed = self.get_all_open_orders()
         self.check_cancel()
         self.write_open_orders()
-        elapsed_time = time.time() - start_time
-        print("Open orders checked & printed to open_orders.csv in {0} seconds.\n".format(elapsed_time))
+        elapsed_time = time.perf_counter() - start_time
+        metrics.observe("open_orders_cycle_seconds", elapsed_time, **self.labels())
+        logger.info("Open orders checked & journaled in %.3f seconds.", elapsed_time)
+        return closed
 
     def make_info_and_execute(self):
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         self.update()
-        self.data.sort_values(by='percentage_diffs', ascending=False, inplace=True)
-        self.trunk_quantity()
-        for symbols in self.data.index:
-            self.execute_buy_or_sell(symbols)
+        orders = self.plan_orders()
+        with metrics.timer("rebalance_phase_seconds", phase="orders", **self.labels()):
+            async_api.run(self.execute_all(orders))
 
-        elapsed_time = time.time() - start_time
-        print("Orders found and executed, in {0} seconds.\n".format(elapsed_time))
+        elapsed_time = time.perf_counter() - start_time
+        metrics.observe("rebalance_cycle_seconds", elapsed_time, **self.labels())
+        logger.info("Orders found and executed, in %.3f seconds.", elapsed_time)
+
+        if self.first_rebalance is None:
+            self.first_rebalance = time.time() - metrics.STARTED
+            metrics.set("time_to_first_rebalance_seconds", self.first_rebalance, **self.labels())
+            logger.info("First rebalance done %.3f seconds after start.", self.first_rebalance)
 
     def portfolio_tracker(self):
         self.time_binance.append(time.time() * 1000)
         self.rebalance.append(self.portfolio_total)
         self.hodl.append(self.hodl_total)
+        if self.recorder is not None:
+            self.recorder.record(recorder.REBALANCE, {"total": self.portfolio_total, "hodl_total": self.hodl_total},
+                                 at=self.time_binance[-1])
         self.no_rebalances += 1
+        metrics.set("portfolio_total_usd", self.portfolio_total, **self.labels())
+        metrics.set("hodl_total_usd", self.hodl_total, **self.labels())
+        metrics.inc("rebalances_total", **self.labels())
 
-        print("Rebalance tracking saved.")
-        print("Number of rebalances since run start: {0}.\n".format(self.no_rebalances))
+        logger.debug("Rebalance tracking saved.")
+        logger.info("Number of rebalances since run start: %s.", self.no_rebalances)
 
-    def sched_builder_rebalance(self, sc):
+    def enter(self, job, delay, priority, action):
+        """Schedules a job, remembering when it is due so the delay in actually starting it can be measured"""
+        self.due[job] = time.time() + delay
+        self.s.enter(delay, priority, action, (self.s,))
+
+    def observe_drift(self, job):
+        """Records how late a job started against when it was due, e.g. behind a slow rebalance"""
+        metrics.observe("scheduler_drift_seconds", time.time() - self.due[job], job=job, **self.labels())
+
+    def attempt(self, job, action):
+        """
+        Runs a job's exchange calls. If the exchange stays down past every retry the error is logged and the job
+        runs again when next due, rather than stopping the scheduler.
+
+        Returns:
+            bool: False if the job failed
+
+        """
+        try:
+            action()
+            return True
+        except ValueError as error:
+            metrics.inc("job_failures_total", job=job, **self.labels())
+            logger.error("%s failed, trying again at its next run: %s", job, error)
+            return False
+
+    def rebalance_and_track(self):
         self.make_info_and_execute()
         self.portfolio_tracker()
-        self.s.enter(self.rebalance_duration, 1, self.sched_builder_rebalance, (sc,))
 
-    def sched_builder_open(self, sc):
+    def sched_builder_rebalance(self, sc):
+        self.observe_drift("rebalance")
+        self.attempt("rebalance", self.rebalance_and_track)
+        self.enter("rebalance", self.rebalance_duration, 1, self.sched_builder_rebalance)
+
+    def check_open_orders(self):
         self.current_time = time.time() * 1000
-        self.open_orders_handling()
-        self.s.enter(self.open_order_check_duration, 1, self.sched_builder_open, (sc,))
+        closed = self.open_orders_handling()
+        if closed and self.tracker is not None:
+            # Fills moved balances, which prices alone do not show
+            self.all_balances = api.balances()
+            if self.recorder is not None:
+                self.recorder.record(recorder.BALANCES, self.all_balances)
+            self.tracker.set_balances(self.portfolio_balances())
+
+    def sched_builder_open(self, sc):
+        self.observe_drift("open_orders")
+        self.attempt("open_orders", self.check_open_orders)
+        self.enter("open_orders", self.open_order_check_duration, 1, self.sched_builder_open)
 
     def sched_builder_telegram(self, sc):
-        self.data['Balance Portfolio'] = self.data['portfolio_balances'] - self.data['hodl_balances']
-        self.client.send_message(self.username,
-                                 'REBALANCING BOT INFO\n' + str(datetime.date.today()) +
-                                 '\n\nTotal run time: ' + str(datetime.datetime.now() - self.init_time) +
-                                 '\n\nTrades today: ' + str(self.number_of_trades) +
-                                 '\nVolumes of trades today: ' + str(self.volume_of_trades)
-                                 + '\n\nDifference in balances since start time: \n\n' +
-                                 pd.DataFrame(self.data['Balance Portfolio'].values, index=self.data['coin_name'],
-                                              columns=['Profit'], ).to_string(col_space=15)
-                                 + '\n\nProfit against HODLing: $' + str(self.portfolio_total - self.hodl_total) +
-                                 '\nProfit against HODLing: ' + str((self.portfolio_total / self.hodl_total) - 1)
-                                 + '%')
+        """Posts a report to the reporter, which formats and sends it on its own thread"""
+        self.observe_drift("telegram")
+        snapshot = {
+            "date": datetime.date.today(),
+            "run_time": datetime.datetime.now() - self.init_time,
+            "trades": self.number_of_trades,
+            "volume": self.volume_of_trades,
+            "coins": list(self.data['coin_name']),
+            "balances": self.portfolio.balances - self.portfolio.hodl_balances,
+            "total": self.portfolio_total,
+            "hodl_total": self.hodl_total,
+        }
+        # One key per account, so a report still waiting is replaced by the next one rather than sent behind it
+        self.get_reporter().post(self.username, functools.partial(telegram_report, snapshot),
+                                 key=self.account.name if self.account is not None else "",
+                                 merge=merge_reports)
         self.number_of_trades = 0
         self.volume_of_trades = 0
-        self.s.enter(self.telegram_time_per_message, 1, self.sched_builder_telegram, (sc,))
+        self.enter("telegram", self.telegram_time_per_message, 1, self.sched_builder_telegram)
+
+    def get_reporter(self):
+        """The reporter set by the Orchestrator, or one of this tester's own sending through client"""
+        if self.reporter is None:
+            self.reporter = reporting.Reporter(self.client.send_message,
+                                               max_pending=self.config.get("telegram_queue_size") or 100,
+                                               max_retries=self.config.get("telegram_retries") or 3).start()
+        return self.reporter
 
     def start(self):
-        self.s.enter(self.rebalance_duration, 1, self.sched_builder_rebalance, (self.s,))
+        try:
+            if self.rebalance_mode == "stream":
+                self.start_stream()
+                return
+            self.enter("rebalance", self.rebalance_duration, 1, self.sched_builder_rebalance)
+            if self.config['telegram_on']:
+                self.enter("telegram", self.telegram_time_per_message, 2, self.sched_builder_telegram)
+            self.enter("open_orders", self.open_order_check_duration, 3, self.sched_builder_open)
+            self.s.run()
+        finally:
+            # Writes the records still waiting for their chunk
+            if self.recorder is not None:
+                self.recorder.close()
+
+    def portfolio_balances(self):
+        """Free balances of the portfolio coins from all_balances, less their protected balances"""
+        return pd.Series({symbols: float(self.all_balances[coin]["free"]) - float(protected)
+                          for symbols, coin, protected in zip(self.data.index, self.data['coin_name'],
+                                                              self.data['protected_balance'])})
+
+    def price_stream(self):
+        """The configured price stream, the exchange's WebSocket ticker by default or polling of prices()"""
+        import rebalancer.stream as stream
+        symbols = sorted(set(self.data.index) | set(self.converter.symbols))
+        if self.config.get("price_stream") == "poll":
+            return stream.PollingStream(symbols, interval=self.config.get("stream_poll_seconds") or self.tick_duration)
+        return stream.TickerStream(symbols, endpoint=self.config.get("stream_endpoint") or stream.STREAM_ENDPOINT)
+
+    def start_stream(self, price_stream=None):
+        """
+        Rebalances when a coin drifts further than drift_band from its target, instead of every rebalance_ticks.
+        Weights are updated from each streamed price, and open order checks and telegram messages keep their
+        schedule between updates.
+
+        Args:
+            price_stream (stream.PriceStream, optional): defaults to price_stream()
+        """
+        self.tracker = DriftTracker(list(self.data.index), self.data['target'].astype(float), self.drift_band,
+                                    converter=self.converter)
+        self.tracker.set_balances(self.data['portfolio_balances'])
+        self.tracker.set_prices(self.all_prices)
+        price_stream = (price_stream or self.price_stream()).start()
+
         if self.config['telegram_on']:
-            self.s.enter(self.telegram_time_per_message, 2, self.sched_builder_telegram, (self.s,))
-        self.s.enter(self.open_order_check_duration, 3, self.sched_builder_open, (self.s,))
-        self.s.run()
+            self.enter("telegram", self.telegram_time_per_message, 2, self.sched_builder_telegram)
+        self.enter("open_orders", self.open_order_check_duration, 3, self.sched_builder_open)
+
+        last_rebalance = 0.0
+        try:
+            while not price_stream.stopped.is_set() or not price_stream.queue.empty():
+                timeout = min(max(self.s.queue[0].time - time.time(), 0), 1) if self.s.queue else 1
+                updates = price_stream.drain(timeout=timeout)
+                for symbol, price in updates.items():
+                    self.tracker.set_price(symbol, price)
+                if updates and self.recorder is not None:
+                    # Only the symbols that moved, a replay carries the others' last prices forward
+                    self.recorder.record(recorder.PRICES, updates)
+
+                if updates:
+                    metrics.set("portfolio_max_drift", self.tracker.max_drift(), **self.labels())
+                    # Balances only move once the last rebalance's orders close, until then the drift is stale
+                    if self.tracker.breached() and time.time() - last_rebalance >= self.stream_cooldown and \
+                            not len(self.all_open_orders):
+                        logger.info("Drift of %.4f past the %.4f band, rebalancing.", self.tracker.max_drift(),
+                                    self.drift_band)
+                        metrics.inc("drift_rebalances_total", **self.labels())
+                        if self.attempt("rebalance", self.rebalance_and_track):
+                            self.tracker.set_balances(self.portfolio.balances)
+                            self.tracker.set_prices(self.all_prices)
+                        # A failed rebalance also waits out the cooldown rather than retrying on every price
+                        last_rebalance = time.time()
+                self.s.run(blocking=False)
+        finally:
+            price_stream.stop()
+
+
+def telegram_report(snapshot):
+    """Text of a LiveTester report, from the values sched_builder_telegram() took"""
+    return ('REBALANCING BOT INFO\n' + str(snapshot["date"]) +
+            '\n\nTotal run time: ' + str(snapshot["run_time"]) +
+            '\n\nTrades today: ' + str(snapshot["trades"]) +
+            '\nVolumes of trades today: ' + str(snapshot["volume"])
+            + '\n\nDifference in balances since start time: \n\n' +
+            pd.DataFrame(snapshot["balances"], index=snapshot["coins"], columns=['Profit']).to_string(col_space=15)
+            + '\n\nProfit against HODLing: $' + str(snapshot["total"] - snapshot["hodl_total"]) +
+            '\nProfit against HODLing: ' + str((snapshot["total"] / snapshot["hodl_total"]) - 1)
+            + '%')
+
+
+def merge_reports(waiting, report):
+    """A report replacing one still waiting, with the trades and volume of both since they are counted per report"""
+    older, newer = waiting.args[0], report.args[0]
+    snapshot = dict(newer, trades=older["trades"] + newer["trades"], volume=older["volume"] + newer["volume"])
+    return functools.partial(telegram_report, snapshot)
 
 
 class BackTester(Tester):
     def __init__(self, config_uri):
         super().__init__(config_uri)
 
+        self.fill_model = config_uri.get("fill_model") or "close"
+        if self.fill_model not in ("close", "candle"):
+            raise ValueError("fill_model must be close or candle")
+        self.fill_participation = config_uri.get("fill_participation") or 0.1
+        self.fill_limit_offset = config_uri.get("fill_limit_offset") or 0.0
+        self.plot_path = config_uri.get("plot_path") or "./rebalancer/backtest.png"
+        self.plot_points = config_uri.get("plot_points") or 2000
+        self.plot_downsampling = config_uri.get("plot_downsampling") or "minmax"
+
         self.volumes = []
         self.trades = []
 
-        self.data['portfolio_balances'] = pd.Series({"BTCUSDT": 0, "QSPBTC": 0, "XLMBTC": 0,
-                                                     "NEOBTC": 0, "MODBTC": 0, "ETHBTC": 0.1,
-                                                     "MTLBTC": 0, "XRPBTC": 0, "OMGBTC": 10000,
-                                                     "LTCBTC": 0})
-        self.data['hodl_balances'] = self.data['portfolio_balances']
-
-        self.all_prices = api.prices()
-        self.data['portfolio_prices'] = pd.Series({symbols: float(self.all_prices[symbols]) for symbols in self.data.index})
-        self.update()
-        self.update_portfolio_balances()
-        self.data['hodl_balances'] = self.data['portfolio_balances']
+        # A recording of the live tester replays the prices it fetched from the balances it started with
+        self.replay = None
+        if config_uri.get("replay_path") and self.fill_model == "candle":
+            # Snapshots fall at any time between candles, so no high, low or volume lines up with them
+            raise ValueError("fill_model candle needs stored klines, a replay_path only holds recorded prices")
+        if config_uri.get("replay_path"):
+            self.replay = recorder.Replay(config_uri["replay_path"], list(self.data.index),
+                                          list(self.data['coin_name']))
+            if self.replay.balances is None:
+                raise ValueError("No balances recorded in {0}".format(config_uri["replay_path"]))
+
+        if self.replay is not None:
+            self.data['portfolio_balances'] = self.replay.balances - self.data['protected_balance'].astype(float)
+            self.data['hodl_balances'] = self.data['portfolio_balances']
+            self.data['portfolio_prices'] = self.replay.closes.iloc[0]
+            self.update()
+            self.previous_klines = self.replay.closes
+        else:
+            self.data['portfolio_balances'] = pd.Series({"BTCUSDT": 0, "QSPBTC": 0, "XLMBTC": 0,
+                                                         "NEOBTC": 0, "MODBTC": 0, "ETHBTC": 0.1,
+                                                         "MTLBTC": 0, "XRPBTC": 0, "OMGBTC": 10000,
+                                                         "LTCBTC": 0})
+            self.data['hodl_balances'] = self.data['portfolio_balances']
+
+            self.all_prices = api.prices()
+            self.data['portfolio_prices'] = pd.Series({symbols: float(self.all_prices[symbols])
+                                                       for symbols in self.data.index})
+            self.update()
+            self.update_portfolio_balances()
+            self.data['hodl_balances'] = self.data['portfolio_balances']
 
-        self.previous_klines = self.get_portfolio_klines()
+            self.previous_klines = self.get_portfolio_klines()
         self.timestamps = list(self.previous_klines.index)
 
         self.hodl = []
         self.rebalance = []
 
     def update_portfolio_balances(self):
-        self.data.sort_values(by=['percentage_diffs'], ascending=False, inplace=True)
-        for symbols in self.data.index:
+        for symbols in self.data['percentage_diffs'].sort_values(ascending=False).index:
             if (self.data.loc[symbols, "if_buy"] or not self.data.loc[symbols, "if_buy"]) and symbols != "BTCUSDT":
                 self.volume_of_trades += abs(self.data.loc[symbols, 'trade_volumes'])
                 self.volumes.append(self.volume_of_trades)
@@ -401,53 +706,143 @@ class BackTester(Tester):
         Takes prices form kline data and balances from previous dict, calculates required info,
         overwrites previous dict
         """
-        # Convert BTC values to USD values
-        self.get_portfolio_prices_usd()
-        # Calculate amount of each coin held in terms of USD
-        self.data['total_usd'] = pd.Series({symbols: self.data['portfolio_balances'][symbols] *
-                                            self.data['portfolio_prices_usd'][symbols] for symbols in self.data.index})
-        self.data['total_usd_hodl'] = pd.Series({symbols: self.data['hodl_balances'][symbols] *
-                                            self.data['portfolio_prices_usd'][symbols] for symbols in self.data.index})
-
-        # Calculates the total value of the portfolio
-        self.portfolio_total = sum(self.data['total_usd'])
-        self.hodl_total = sum(self.data['total_usd_hodl'])
-
-        # Calculates the percentages of each coin in portfolio in USD
-        self.data['percentages'] = pd.Series({symbols: self.data['portfolio_prices_usd'][symbols] *
-                                              self.data['portfolio_balances'][symbols] / self.portfolio_total
-                                              for symbols in self.data.index})
-
-        # Calculate percentage differences from target percentages for each coin
-        self.data['percentage_diffs'] = pd.Series({symbols: float(self.data['target'][symbols]) -
-                                                   self.data['percentages'][symbols]
-                                                   for symbols in self.data.index})
-
-        # Calculate required purchase volume for each coin
-        self.data['purchase_volumes'] = pd.Series({symbols: self.data['percentage_diffs'][symbols] *
-                                                            self.portfolio_total /
-                                                            self.data['portfolio_prices_usd'][symbols]
-                                                   for symbols in self.data.index})
-
-        # Calculate USD value of purchase volume
-        self.data['trade_volumes'] = pd.Series({symbols: self.data['purchase_volumes'][symbols] *
-                                                         self.data['portfolio_prices_usd'][symbols]
-                                                for symbols in self.data.index})
-
-        self.buy_or_sell()
+        self.portfolio.set_balances(self.data['portfolio_balances'], hodl_balances=self.data['hodl_balances'])
+        self.portfolio.set_prices(self.data['portfolio_prices'])
+        self.write_portfolio()
 
     def rebalance_backtest(self):
-        for ticks in self.previous_klines.index:
-            self.current_time = ticks
-
-            self.data['portfolio_prices'] = pd.Series({symbols: float(self.previous_klines.loc[ticks, symbols])
-                                                       for symbols in self.data.index})
-
-            self.update()
-            self.update_portfolio_balances()
+        """
+        Rebalances the portfolio at every kline close using the vectorised engine, then leaves self.data in the
+        state of the last tick.
+        """
+        # The backtest modules are only loaded by the testers that run them, so live trading starts without them
+        import rebalancer.engine as engine
+        symbols = list(self.data.index)
+        base_index = symbols.index("BTCUSDT")
+        closes = self.previous_klines[symbols].to_numpy(dtype=float)
+
+        model, candles = self.candle_fills(symbols, closes) if self.fill_model == "candle" else (None, None)
+        result = engine.run_backtest(engine.usd_prices(closes, base_index),
+                                     self.data['portfolio_balances'].to_numpy(dtype=float),
+                                     self.data['hodl_balances'].to_numpy(dtype=float),
+                                     self.data['target'].to_numpy(dtype=float),
+                                     self.transaction_fee, base_index, volume_of_trades=self.volume_of_trades,
+                                     fills=model, candles=candles)
+
+        self.rebalance.extend(result.rebalance.tolist())
+        self.hodl.extend(result.hodl.tolist())
+        self.volumes.extend(result.volumes.tolist())
+        self.trades.extend(result.trades.tolist())
+
+        if len(closes):
+            self.current_time = self.previous_klines.index[-1]
+            self.volume_of_trades = self.volumes[-1]
+            self.number_of_trades = self.trades[-1]
+            self.data['portfolio_balances'] = pd.Series(result.balances, index=symbols)
+            self.data['portfolio_prices'] = pd.Series(closes[-1], index=symbols)
             self.update()
-            self.rebalance.append(self.portfolio_total)
-            self.hodl.append(self.hodl_total)
+
+    def candle_fills(self, symbols, closes):
+        """Fill model and stored high, low and volume candles of fill_model candle, aligned with previous_klines"""
+        import rebalancer.fills as fills
+        import rebalancer.history as history
+        candles = {"close": closes}
+        for name in ("high", "low", "volume"):
+            frame = self.kline_store.field(symbols, self.candle_time, name).reindex(self.previous_klines.index)
+            candles[name] = frame[symbols].to_numpy(dtype=float)
+        expiry, window = fills.CandleFills.lifetime(self.maxOrdertime, history.INTERVAL_MS.get(self.candle_time))
+        model = fills.CandleFills.from_exchange_info(self.exchange_info, symbols,
+                                                     participation=self.fill_participation,
+                                                     limit_offset=self.fill_limit_offset, expiry=expiry, window=window)
+        return model, candles
 
     def plot(self):
-        plt(self.timestamps, self.rebalance, self.hodl, self.volumes, self.trades)
+        """Writes the backtest charts to plot_path, downsampled so long backtests stay quick to draw"""
+        # matplotlib is slow to import and only backtests plot
+        import rebalancer.rendering as rendering
+        path = rendering.render_backtest(self.plot_path, self.timestamps, self.rebalance, self.hodl, self.volumes,
+                                         points=self.plot_points, method=self.plot_downsampling)
+        logger.info("Backtest charts written to %s.", path)
+
+
+class SweepTester(Tester):
+    """
+    Backtests a grid, or a random sample, of candle times, rebalance thresholds, fees and target percentages across
+    a process pool and ranks them by profit against hodling.
+    """
+    def __init__(self, config):
+        super().__init__(config)
+
+        self.candle_times = config.get("sweep_candle_times") or [self.candle_time]
+        self.thresholds = config.get("sweep_thresholds") or [0.0]
+        self.fees = config.get("sweep_fees") or [self.transaction_fee]
+        self.targets = config.get("sweep_targets") or [list(self.data['target'].astype(float))]
+        self.samples = config.get("sweep_samples")
+        self.workers = config.get("sweep_workers")
+
+        self.results = None
+
+    def run_sweep(self):
+        import rebalancer.engine as engine
+        import rebalancer.sweep as sweep
+        symbols = list(self.data.index)
+        base_index = symbols.index("BTCUSDT")
+        prices_usd = {candle_time: engine.usd_prices(self.get_portfolio_klines(candle_time).to_numpy(dtype=float),
+                                                     base_index)
+                      for candle_time in self.candle_times}
+
+        configurations = sweep.grid(self.candle_times, self.thresholds, self.fees, self.targets, samples=self.samples)
+        start_time = time.time()
+        self.results = sweep.run(prices_usd, base_index, configurations, workers=self.workers)
+        elapsed_time = time.time() - start_time
+
+        logger.info("%s configurations backtested in %.3f seconds.", len(configurations), elapsed_time)
+        logger.info("Top configurations:\n%s", self.results.head(20).to_string())
+        self.results.to_csv("./rebalancer/sweep_results.csv", index=False)
+
+
+class RobustnessTester(Tester):
+    """
+    Backtests the portfolio over rolling walk-forward windows of its kline history and over block bootstrapped price
+    paths resampled from it, then summarises how rebalancing compares with hodling across all of them.
+    """
+    def __init__(self, config):
+        super().__init__(config)
+
+        self.threshold = config.get("robustness_threshold") or 0.0
+        self.window = config.get("robustness_window")
+        self.step = config.get("robustness_step")
+        self.paths = config.get("robustness_paths") or 10000
+        self.ticks = config.get("robustness_ticks")
+        self.block = config.get("robustness_block") or 24
+        self.batch = config.get("robustness_batch") or 256
+        self.workers = config.get("robustness_workers")
+        self.seed = config.get("robustness_seed")
+
+        self.walk_forward = None
+        self.monte_carlo = None
+
+    def run_robustness(self):
+        import rebalancer.engine as engine
+        import rebalancer.robustness as robustness
+        symbols = list(self.data.index)
+        base_index = symbols.index("BTCUSDT")
+        prices_usd = engine.usd_prices(self.get_portfolio_klines().to_numpy(dtype=float), base_index)
+        targets = list(self.data['target'].astype(float))
+
+        start_time = time.time()
+        self.walk_forward = robustness.walk_forward(prices_usd, base_index, targets, self.transaction_fee,
+                                                    self.window or max(2, len(prices_usd) // 4), step=self.step,
+                                                    threshold=self.threshold)
+        self.monte_carlo = robustness.monte_carlo(prices_usd, base_index, targets, self.transaction_fee,
+                                                  paths=self.paths, ticks=self.ticks, block=self.block,
+                                                  threshold=self.threshold, batch=self.batch, workers=self.workers,
+                                                  seed=self.seed)
+        elapsed_time = time.time() - start_time
+
+        logger.info("%s walk-forward windows and %s bootstrapped paths backtested in %.3f seconds.",
+                    len(self.walk_forward), len(self.monte_carlo), elapsed_time)
+        logger.info("Walk-forward:\n%s", robustness.summarize(self.walk_forward).to_string())
+        logger.info("Bootstrapped paths:\n%s", robustness.summarize(self.monte_carlo).to_string())
+        self.walk_forward.to_csv("./rebalancer/walk_forward_results.csv", index=False)
+        self.monte_carlo.to_csv("./rebalancer/monte_carlo_results.csv", index=False)
@@ -3,11 +3,17 @@ from setuptools import setup
 setup(
     name='rebalancer',
     version='1.4',
-    py_modules=['binance_api', 'testers', 'graphics'],
+    py_modules=['binance_api', 'testers', 'graphics', 'engine', 'kline_store', 'history',
+                'async_api', 'rate_limit', 'exchange_info',
+                'orders', 'journal', 'sweep',
+                'mock_exchange', 'metrics', 'execution',
+                'stream', 'drift', 'portfolio', 'conversion',
+                'orchestrator', 'fills', 'robustness', 'reporting', 'rendering',
+                'recorder'],
 
     # metadata
     author='Devon Brazier',
     url='https://github.com/yenille/rebalancer',
     description='Binance rebalance trading bot',
-    install_requires=['eventlet', 'requests', 'pandas', 'telegram']
+    install_requires=['requests', 'pandas', 'telegram', 'numpy', 'websocket-client', 'matplotlib']
 )
\ No newline at end of file
@@ -0,0 +1,44 @@
+import os
+import pytest
+import yaml
+import rebalancer.mock_exchange as mock_exchange
+
+
+SYMBOLS = ["BTCUSDT", "ETHBTC", "LTCBTC"]
+BLANK = os.path.join(os.path.dirname(__file__), "..", "rebalancer", "config-blank.yaml")
+
+
+@pytest.fixture
+def exchange():
+    """A mock exchange replaying synthetic prices, only advanced by step()"""
+    history = mock_exchange.synthetic_history(SYMBOLS, ticks=200, seed=1)
+    exchange = mock_exchange.MockExchange(history, start_row=100, tick_seconds=0, seed=1)
+    server = mock_exchange.serve(exchange)
+    exchange.endpoint = "http://127.0.0.1:{0}".format(server.server_port)
+    yield exchange
+    server.shutdown()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """A working directory with a ./rebalancer/portfolio.csv of the mock exchange's coins"""
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("rebalancer")
+    with open("rebalancer/portfolio.csv", "w") as file:
+        file.write("coin_name,symbol,target,protected_balance\nBTC,BTCUSDT,0.4,0\nETH,ETHBTC,0.3,0\n"
+                   "LTC,LTCBTC,0.3,0\n")
+    return tmp_path
+
+
+@pytest.fixture
+def blank_config(exchange):
+    """Builds config-blank.yaml with only the settings a livetest cannot do without filled in, then settings"""
+    def build(**settings):
+        with open(BLANK) as file:
+            config = yaml.safe_load(file)
+        config.update(tester_type="livetest", livetest_test=True, endpoint=exchange.endpoint, tick_duration=1,
+                      rebalance_ticks=60, open_order_check_ticks=10, open_order_time_limit=60, telegram_ticks=60,
+                      candle_time="1m", transaction_fee=0.001, minimum_btc_order=0.0001)
+        config.update(settings)
+        return config
+    return build
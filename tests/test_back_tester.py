@@ -0,0 +1,9 @@
+import pytest
+from rebalancer.testers import BackTester
+
+
+def test_replays_cannot_fill_against_candles(blank_config, workdir, monkeypatch):
+    monkeypatch.setenv("API_KEY", "key")
+    monkeypatch.setenv("SECRET_KEY", "secret")
+    with pytest.raises(ValueError, match="fill_model candle"):
+        BackTester(blank_config(tester_type="backtest", replay_path="./rebalancer/live.record", fill_model="candle"))
@@ -0,0 +1,39 @@
+from decimal import Decimal
+import pytest
+import rebalancer.binance_api as api
+import rebalancer.execution as execution
+from rebalancer.exchange_info import SymbolFilters
+
+
+def altcoin(tick_size=0.00000001):
+    return SymbolFilters("XYZBTC", "XYZ", "BTC", "TRADING", min_qty=1.0, step_size=1.0, tick_size=tick_size,
+                         min_notional=0.0001)
+
+
+def test_plan_prices_children_without_exponents():
+    book = execution.Book("XYZBTC", {"0.00000049": "100000"}, {"0.00000050": "100000"})
+    order_plan = execution.plan(execution.BUY, 1000.0, book, step_size=1.0, min_qty=1.0, min_notional=0.0001,
+                                tick_size=0.00000001)
+    assert [child.price for child in order_plan.children] == ["0.00000050"]
+
+
+def test_batch_prices_are_sent_without_exponents():
+    orders = execution.batch(["XYZBTC"], [1000.0], [0.0000005], [altcoin()])
+    assert orders[0].price == Decimal("5E-7")
+    assert api.formatNumber(orders[0].price) == "0.0000005"
+    assert api.formatNumber(Decimal("1E+1")) == "10"
+
+
+def test_mock_exchange_rejects_exponents_like_binance(exchange):
+    api.configure(endpoint=exchange.endpoint, max_retries=0)
+    api.set("key", "secret")
+    rejected = api.order("ETHBTC", api.BUY, "1", "5E-7", test=True)
+    assert rejected["code"] == -1100
+    accepted = api.order("ETHBTC", api.BUY, Decimal("2000"), Decimal("5E-7"), test=True)
+    assert accepted == {}
+
+
+def test_plan_slippage_follows_the_participation_cap():
+    book = execution.Book("XYZBTC", {"0.99": "10"}, {"1.00": "10", "1.01": "10"})
+    order_plan = execution.plan(execution.BUY, 10.0, book, participation=0.5, max_slippage=0.02)
+    assert order_plan.average_price == pytest.approx(1.005)
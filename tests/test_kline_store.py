@@ -0,0 +1,23 @@
+import numpy as np
+from rebalancer.kline_store import KlineStore
+
+
+MINUTE = 60 * 1000
+
+
+def kline(minute, close, volume):
+    return {"openTime": minute * MINUTE, "open": close, "high": close + 1, "low": close - 1, "close": close,
+            "volume": volume, "closeTime": (minute + 1) * MINUTE - 1, "quoteVolume": volume * close, "numTrades": 5}
+
+
+def test_only_closes_carry_into_missing_candles(tmp_path):
+    store = KlineStore(str(tmp_path))
+    store.append("ETHBTC", "1m", [kline(0, 10.0, 3.0), kline(1, 11.0, 4.0), kline(3, 12.0, 5.0)])
+    store.append("LTCBTC", "1m", [kline(minute, 20.0, 1.0) for minute in range(4)])
+    symbols = ["ETHBTC", "LTCBTC"]
+
+    assert store.closes(symbols, "1m")["ETHBTC"].tolist() == [10.0, 11.0, 11.0, 12.0]
+    assert store.field(symbols, "1m", "volume")["ETHBTC"].tolist() == [3.0, 4.0, 0.0, 5.0]
+    assert np.isnan(store.field(symbols, "1m", "high")["ETHBTC"].iloc[2])
+    assert np.isnan(store.field(symbols, "1m", "low")["ETHBTC"].iloc[2])
+    assert store.field(symbols, "1m", "volume")["LTCBTC"].tolist() == [1.0] * 4
@@ -0,0 +1,120 @@
+import json
+from decimal import Decimal
+import rebalancer.async_api as async_api
+import rebalancer.execution as execution
+import rebalancer.recorder as recorder
+import rebalancer.binance_api as api
+import rebalancer.stream as stream
+from rebalancer.testers import LiveTester
+
+
+def live_tester(blank_config, monkeypatch, **settings):
+    monkeypatch.setenv("API_KEY", "key")
+    monkeypatch.setenv("SECRET_KEY", "secret")
+    return LiveTester(blank_config(http_max_retries=1, **settings))
+
+
+def place(tester, exchange, symbol="ETHBTC"):
+    """Places a buy far below the price on the mock exchange, so it stays open, and tracks it like a live order"""
+    price = exchange.price(symbol) / 2
+    infos = api.order(symbol, api.BUY, "{0:.3f}".format(0.01 / price), "{0:.8f}".format(price))
+    tester.journal_placed(infos)
+    return exchange.orders[infos["orderId"]]
+
+
+def journaled(tester):
+    """Events journaled by the tester, as (event, orderId)"""
+    with open(tester.order_journal.path) as file:
+        return [(entry["event"], entry["order"]["orderId"]) for entry in map(json.loads, file)]
+
+
+def test_scheduled_jobs_outlive_an_exchange_outage(exchange, blank_config, workdir, monkeypatch):
+    tester = live_tester(blank_config, monkeypatch)
+
+    exchange.error_rate = 1.0
+    tester.enter("rebalance", 0, 1, tester.sched_builder_rebalance)
+    tester.enter("open_orders", 0, 1, tester.sched_builder_open)
+    tester.s.run(blocking=False)
+    assert tester.no_rebalances == 0
+    assert sorted(event.action.__name__ for event in tester.s.queue) == ["sched_builder_open",
+                                                                        "sched_builder_rebalance"]
+
+    exchange.error_rate = 0.0
+    tester.sched_builder_rebalance(tester.s)
+    tester.sched_builder_open(tester.s)
+    assert tester.no_rebalances == 1
+
+
+def test_stream_rebalances_outlive_an_exchange_outage(exchange, blank_config, workdir, monkeypatch):
+    tester = live_tester(blank_config, monkeypatch, rebalance_mode="stream", drift_band=0.01, stream_cooldown=0)
+
+    exchange.error_rate = 1.0
+    # Every update drifts ETH far past the band, so each one asks for a rebalance
+    price = float(tester.all_prices["ETHBTC"])
+    tester.start_stream(stream.FeedStream([("ETHBTC", price * 2), ("ETHBTC", price * 3)]))
+    assert tester.no_rebalances == 0
+
+
+def test_only_orders_whose_cancel_succeeded_expire(exchange, blank_config, workdir, monkeypatch):
+    tester = live_tester(blank_config, monkeypatch)
+    cancelled, filled = place(tester, exchange), place(tester, exchange)
+    # Fills between the last open orders sync and the cancel, which the exchange then rejects
+    filled["status"] = "FILLED"
+
+    tester.maxOrdertime = -1000
+    tester.check_cancel()
+    assert cancelled["status"] == "CANCELED"
+    assert ("expired", cancelled["orderId"]) in journaled(tester)
+    assert ("expired", filled["orderId"]) not in journaled(tester)
+    assert filled["orderId"] in tester.all_open_orders and cancelled["orderId"] not in tester.all_open_orders
+
+
+def test_orders_that_left_the_book_are_journaled_as_filled_or_cancelled(exchange, blank_config, workdir,
+                                                                       monkeypatch):
+    tester = live_tester(blank_config, monkeypatch)
+    filled, cancelled = place(tester, exchange), place(tester, exchange)
+    exchange.fill(filled)
+    api.cancel(cancelled["symbol"], orderId=cancelled["orderId"])
+
+    closed = tester.get_all_open_orders()
+    assert sorted(elems["orderId"] for elems in closed) == sorted([filled["orderId"], cancelled["orderId"]])
+    assert ("filled", filled["orderId"]) in journaled(tester)
+    assert ("cancelled", cancelled["orderId"]) in journaled(tester)
+    assert not len(tester.all_open_orders)
+
+
+def test_rejected_orders_are_not_counted_as_trades(exchange, blank_config, workdir, monkeypatch):
+    tester = live_tester(blank_config, monkeypatch, livetest_test=False)
+    order = execution.Order("ETHBTC", api.BUY, Decimal("1"), Decimal("{0:.8f}".format(exchange.price("ETHBTC"))))
+
+    exchange.balances["BTC"]["free"] = 0.0
+    async_api.run(tester.execute_order(order))
+    assert (tester.number_of_trades, tester.volume_of_trades) == (0, 0)
+
+    exchange.balances["BTC"]["free"] = 1.0
+    async_api.run(tester.execute_order(order))
+    assert tester.number_of_trades >= 1 and tester.volume_of_trades > 0
+
+
+def test_stream_waits_for_the_orders_of_its_last_rebalance(exchange, blank_config, workdir, monkeypatch):
+    tester = live_tester(blank_config, monkeypatch, livetest_test=False, rebalance_mode="stream", drift_band=0.01,
+                         stream_cooldown=0)
+
+    # The portfolio starts all in BTC, far from its targets, and stays there until its orders are synced
+    price = float(tester.all_prices["ETHBTC"])
+    tester.start_stream(stream.FeedStream([("ETHBTC", price), ("ETHBTC", price * 1.001)], delay=0.2))
+    assert tester.no_rebalances == 1
+    assert len(tester.all_open_orders)
+
+
+def test_streamed_prices_are_recorded_for_replays(exchange, blank_config, workdir, monkeypatch):
+    tester = live_tester(blank_config, monkeypatch, rebalance_mode="stream", record_path="./rebalancer/live.record")
+    price = float(tester.all_prices["ETHBTC"])
+    tester.start_stream(stream.FeedStream([("ETHBTC", price * 1.001), ("ETHBTC", price * 1.002)], delay=0.1))
+    tester.recorder.close()
+
+    closes = recorder.Replay("./rebalancer/live.record", list(tester.data.index), list(tester.data["coin_name"])).closes
+    streamed = closes[closes["ETHBTC"] != price]
+    assert streamed["ETHBTC"].tolist() == [price * 1.001, price * 1.002]
+    # Symbols that did not move keep their last recorded price
+    assert streamed["LTCBTC"].tolist() == [float(tester.all_prices["LTCBTC"])] * 2
@@ -0,0 +1,60 @@
+import rebalancer.binance_api as api
+import rebalancer.journal as journal
+import rebalancer.metrics as metrics
+from rebalancer.orchestrator import Orchestrator
+from rebalancer.orders import OpenOrders
+from rebalancer.testers import LiveTester
+
+
+def start_testers(orchestrator):
+    """Builds the LiveTester of every account the way Orchestrator.run_account does, without starting them"""
+    testers = {}
+    for account in orchestrator.accounts:
+        with api.use(api.Account(account["name"], "key", "secret")) as credentials:
+            testers[account["name"]] = LiveTester(orchestrator.account_config(account),
+                                                  exchange_info=orchestrator.exchange_info,
+                                                  market_data=orchestrator.market_data, account=credentials)
+    return testers
+
+
+def order(order_id):
+    return {"symbol": "ETHBTC", "orderId": order_id, "time": 0, "side": "BUY", "price": "0.01", "origQty": "1"}
+
+
+def test_accounts_of_the_blank_template_keep_their_own_journals(blank_config, workdir):
+    orchestrator = Orchestrator(blank_config(accounts=[{"name": "main"}, {"name": "spare"}]))
+    testers = start_testers(orchestrator)
+    main, spare = testers["main"].order_journal, testers["spare"].order_journal
+
+    assert (main.path, main.snapshot_path) == ("./rebalancer/main.open_orders.journal",
+                                               "./rebalancer/main.open_orders.csv")
+    assert (spare.path, spare.snapshot_path) == ("./rebalancer/spare.open_orders.journal",
+                                                 "./rebalancer/spare.open_orders.csv")
+    assert testers["main"].recorder is None and testers["spare"].recorder is None
+
+    main.record(journal.PLACED, order(1))
+    spare.record(journal.PLACED, order(2))
+    main.compact(OpenOrders())
+    assert [rows["orderId"] for rows in journal.OrderJournal(spare.path, spare.snapshot_path).replay()] == [2]
+
+
+def test_shared_paths_are_split_per_account_unless_an_account_sets_its_own(blank_config, workdir):
+    config = blank_config(journal_path="./shared.journal", record_path="./live.record",
+                          accounts=[{"name": "main"}, {"name": "spare", "journal_path": "./spare.journal"}])
+    main, spare = [Orchestrator(config).account_config(account) for account in config["accounts"]]
+
+    assert main["journal_path"] == "./rebalancer/main.open_orders.journal"
+    assert spare["journal_path"] == "./spare.journal"
+    assert main["record_path"] == "./rebalancer/main.record"
+    assert spare["record_path"] == "./rebalancer/spare.record"
+
+
+def test_accounts_report_metrics_of_their_own(blank_config, workdir):
+    orchestrator = Orchestrator(blank_config(accounts=[{"name": "main"}, {"name": "spare"}]))
+    testers = start_testers(orchestrator)
+    testers["main"].portfolio_total, testers["spare"].portfolio_total = 100.0, 200.0
+    for tester in testers.values():
+        tester.portfolio_tracker()
+
+    assert metrics.registry.gauges[("portfolio_total_usd", (("account", "main"),))] == 100.0
+    assert metrics.registry.gauges[("portfolio_total_usd", (("account", "spare"),))] == 200.0
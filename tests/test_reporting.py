@@ -0,0 +1,29 @@
+import datetime
+import functools
+import pandas as pd
+from rebalancer.reporting import Reporter
+from rebalancer.testers import merge_reports, telegram_report
+
+
+def report(trades, volume):
+    snapshot = {"date": datetime.date(2024, 1, 1), "run_time": datetime.timedelta(hours=1), "trades": trades,
+                "volume": volume, "coins": ["BTC", "ETH"], "balances": pd.Series([0.0, 0.0]), "total": 101.0,
+                "hodl_total": 100.0}
+    return functools.partial(telegram_report, snapshot)
+
+
+def test_a_report_replacing_a_waiting_one_keeps_its_trades():
+    reporter = Reporter(lambda recipient, text: None)
+    reporter.post("me", report(2, 10.0), key="", merge=merge_reports)
+    reporter.post("me", report(3, 5.0), key="", merge=merge_reports)
+
+    [render] = reporter.take()["me"]
+    assert "Trades today: 5\n" in render()
+    assert "Volumes of trades today: 15.0\n" in render()
+
+
+def test_reports_without_a_key_are_all_sent():
+    reporter = Reporter(lambda recipient, text: None)
+    reporter.post("me", report(2, 10.0))
+    reporter.post("me", report(3, 5.0))
+    assert len(reporter.take()["me"]) == 2